@@ -1,9 +1,9 @@
 """Configuration file for running a single simple simulation."""
 from multiprocessing import cpu_count
-from collections import deque
-import copy
 from icarus.util import Tree
 
+from sweep import Sweep
+
 # GENERAL SETTINGS
 
 # Level of logging output
@@ -34,9 +34,6 @@ RESULTS_FORMAT = 'PICKLE'
 # The implementation of data collectors are located in ./icarus/execution/collectors.py
 DATA_COLLECTORS = ['CACHE_HIT_RATIO', 'LATENCY']
 
-# Queue of experiments
-EXPERIMENT_QUEUE = deque()
-
 # Create experiment
 default = Tree()
 
@@ -81,10 +78,7 @@ REPLACEMENT_POLICIES = [
 
 # default['cache_policy']['name'] = 'LRU'
 
-for strategy in STRATEGIES:
-    for policy in REPLACEMENT_POLICIES:
-        experiment = copy.deepcopy(default)
-        experiment['strategy']['name'] = strategy
-        experiment['cache_policy']['name'] = policy
-        experiment['desc'] = f'DS2OS topology, {strategy} placement strategy, {policy} replacement'
-        EXPERIMENT_QUEUE.append(experiment)
+# Queue of experiments, built lazily from default (see sim/sweep.py)
+EXPERIMENT_QUEUE = Sweep(default, desc='DS2OS topology, {strategy} placement strategy, {policy} replacement')
+EXPERIMENT_QUEUE.axis('strategy', 'strategy.name', STRATEGIES)
+EXPERIMENT_QUEUE.axis('policy', 'cache_policy.name', REPLACEMENT_POLICIES)
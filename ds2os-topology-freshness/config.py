@@ -1,10 +1,14 @@
 from multiprocessing import cpu_count
-from collections import deque
-import copy
 from icarus.util import Tree
 
 import icarus.models as cache
 
+import ds2os
+from sweep import Sweep
+
+# DS2OS workloads emit interned integer content IDs instead of name strings
+ds2os.install()
+
 import csv
 
 TRACE_PATH    = '/Users/danielmeint/experiments/trace/subTrace2.csv'
@@ -48,10 +52,11 @@ RESULTS_FORMAT = 'PICKLE'
 
 # List of metrics to be measured in the experiments
 # The implementation of data collectors are located in ./icarus/execution/collectors.py
-DATA_COLLECTORS = ['CACHE_HIT_RATIO', 'LATENCY']
-
-# Queue of experiments
-EXPERIMENT_QUEUE = deque()
+DATA_COLLECTORS = [
+    'CACHE_HIT_RATIO',
+    'LATENCY',
+    'STALE_OCCUPANCY', # share of cache slots held by overwritten versions, sim/versions.py
+]
 
 # Create experiment
 default = Tree()
@@ -85,6 +90,9 @@ NETWORK_CACHE = [
     0.53 # 18 objects
 ]
 
+# caching strategies see every version as its own content, 18 objects as well
+VERSIONED_NETWORK_CACHE = 0.00053
+
 # Set cache placement
 default['cache_placement']['name'] = 'UNIFORM'
 
@@ -94,7 +102,7 @@ default['content_placement']['name'] = 'DS2OS'
 # caching meta-policies / placement strategies
 STRATEGIES = [
     'NO_CACHE',        # No caching, shortest-path routing
-    # 'LCE',             # Leave Copy Everywhere
+    'LCE',             # Leave Copy Everywhere
     # 'LCD',
     # 'EDGE',
     # 'CL4M',            # Betweenness Centrality, Cache Less For More
@@ -108,6 +116,7 @@ REPLACEMENT_POLICIES = [
     # 'NULL',
     # 'FIFO',
     'LRU',
+    'VERSIONED', # LRU over addresses, drops a cached version when its address is written
     # 'MDMR',
     # 'SLRU', # needs at least 2 segments to make sense, i.e. also at least 2 objects in each cache
     # # 'PERFECT_LFU',
@@ -117,16 +126,20 @@ REPLACEMENT_POLICIES = [
     # # 'MDMR', problematic because many producers only offer one content chunk address // could extend to location, i.e. replace data from garage for data from garage etc.
 ]
 
-# problem: we register 'TTL' and pass 'cache' and 'f_time' as arguments, however, the NetworkModel init assumes for every node a cache_size[node] as maxlen parameter, e.g. LruCache(10)
-# we want the call to be ttl_cache(LruCache(10), f_time) but it does ttl_cache(10, LruCache(10), f_time) instead
-# solved: manually changed in network.py
-for strategy in STRATEGIES:
-    for policy in REPLACEMENT_POLICIES:
-        for network_cache in NETWORK_CACHE:
-            experiment = copy.deepcopy(default)
-            experiment['strategy']['name'] = strategy
-            experiment['cache_policy']['name'] = policy
-            experiment['cache_placement']['network_cache'] = network_cache
-            experiment['desc'] = f'DS2OS topology, {strategy} placement strategy, {policy} replacement, {network_cache} network cache'
-            EXPERIMENT_QUEUE.append(experiment)
-
+# TTL caching: cache_policy {'name': 'TTL', 'policy': 'LRU', 'ttl_source': 'writetimes'} expires every
+# version at its nextWrite, other TTL sources in sim/ttl.py (needs sim/run.py)
+
+# polling-every-time runs on addresses, caching strategies on the versioned
+# contents, where VERSIONED and STALE_OCCUPANCY tell live from dead versions
+caching = lambda p: p['strategy'] != 'NO_CACHE'
+network_cache = lambda p: VERSIONED_NETWORK_CACHE if caching(p) else p['network_cache']
+
+# Queue of experiments, built lazily from default (see sim/sweep.py)
+EXPERIMENT_QUEUE = Sweep(default, desc=lambda p: f"DS2OS topology, {p['strategy']} placement strategy, "
+                                            f"{p['policy']} replacement, {network_cache(p)} network cache")
+EXPERIMENT_QUEUE.axis('strategy', 'strategy.name', STRATEGIES)
+EXPERIMENT_QUEUE.axis('policy', 'cache_policy.name', REPLACEMENT_POLICIES)
+EXPERIMENT_QUEUE.axis('network_cache', 'cache_placement.network_cache', NETWORK_CACHE)
+EXPERIMENT_QUEUE.override('workload.name', 'DS2OS', when=caching)
+EXPERIMENT_QUEUE.override('workload.contents_file', CONTENTS_PATH, when=caching)
+EXPERIMENT_QUEUE.override('cache_placement.network_cache', VERSIONED_NETWORK_CACHE, when=caching)
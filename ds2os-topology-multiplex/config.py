@@ -1,8 +1,8 @@
 from multiprocessing import cpu_count
-from collections import deque
-import copy
 from icarus.util import Tree
 
+from sweep import Sweep
+
 import icarus.models as cache
 
 import csv
@@ -10,34 +10,8 @@ import csv
 TRACE_PATH    = '/Users/danielmeint/experiments/trace/subTrace2.csv'
 CONTENTS_PATH = '/Users/danielmeint/experiments/trace/contents.txt'
 
-# def read_csv(path):
-#     res = []
-#     with open(path) as file:
-#         reader = csv.DictReader(file)
-#         for row in reader:
-#             res.append(row)
-#     return res
-
-# # needed for MIN policy
-# TRACE = []
-# complete_trace = read_csv(TRACE_PATH) # also contains writes
-
-# for request in complete_trace:
-#     # skip writes
-#     if request['operation'] != 'read':
-#         continue
-#     address = request['accessedNodeAddress']
-#     version = request['version']
-#     entry   = f'{address}/v{version}'
-#     TRACE.append(entry)
-
-# req_times = []
-# for i, k in enumerate(TRACE):
-#     if k == '/agent4/movement4/movement/v0':
-#         req_times.append(i)
-
-# print(req_times)
-# print(len(req_times))
+# MIN gets the next request of every content from the replayed workload
+# (sim/replay.py) instead of rescanning the trace
 
 # GENERAL SETTINGS
 
@@ -69,9 +43,6 @@ RESULTS_FORMAT = 'PICKLE'
 # The implementation of data collectors are located in ./icarus/execution/collectors.py
 DATA_COLLECTORS = ['CACHE_HIT_RATIO', 'LATENCY']
 
-# Queue of experiments
-EXPERIMENT_QUEUE = deque()
-
 # Create experiment
 default = Tree()
 
@@ -120,7 +91,7 @@ STRATEGIES = [
 
 # Cache replacement policies
 REPLACEMENT_POLICIES = [
-    # 'MIN', # think this might not work when capacity == 1 at every cache
+    'MIN', # offline optimum, sim/policies.py (needs sim/run.py)
     # 'NULL',
     'FIFO',
     'LRU',
@@ -133,16 +104,12 @@ REPLACEMENT_POLICIES = [
     # 'MDMR', problematic because many producers only offer one content chunk address // could extend to location, i.e. replace data from garage for data from garage etc.
 ]
 
-# problem: we register 'TTL' and pass 'cache' and 'f_time' as arguments, however, the NetworkModel init assumes for every node a cache_size[node] as maxlen parameter, e.g. LruCache(10)
-# we want the call to be ttl_cache(LruCache(10), f_time) but it does ttl_cache(10, LruCache(10), f_time) instead
-# solved: manually changed in network.py
-for strategy in STRATEGIES:
-    for policy in REPLACEMENT_POLICIES:
-        for network_cache in NETWORK_CACHE:
-            experiment = copy.deepcopy(default)
-            experiment['strategy']['name'] = strategy
-            experiment['cache_policy']['name'] = policy
-            experiment['cache_placement']['network_cache'] = network_cache
-            experiment['desc'] = f'DS2OS topology, {strategy} placement strategy, {policy} replacement, {network_cache} network cache'
-            EXPERIMENT_QUEUE.append(experiment)
+# TTL caching: cache_policy {'name': 'TTL', 'policy': 'LRU', 'ttl_source': 'writetimes'} expires every
+# version at its nextWrite, other TTL sources in sim/ttl.py (needs sim/run.py)
+
+# Queue of experiments, built lazily from default (see sim/sweep.py)
+EXPERIMENT_QUEUE = Sweep(default, desc='DS2OS topology, {strategy} placement strategy, {policy} replacement, {network_cache} network cache')
+EXPERIMENT_QUEUE.axis('strategy', 'strategy.name', STRATEGIES)
+EXPERIMENT_QUEUE.axis('policy', 'cache_policy.name', REPLACEMENT_POLICIES)
+EXPERIMENT_QUEUE.axis('network_cache', 'cache_placement.network_cache', NETWORK_CACHE)
 
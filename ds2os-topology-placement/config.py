@@ -1,8 +1,8 @@
 from multiprocessing import cpu_count
-from collections import deque
-import copy
 from icarus.util import Tree
 
+from sweep import Sweep
+
 import icarus.models as cache
 
 # GENERAL SETTINGS
@@ -35,9 +35,6 @@ RESULTS_FORMAT = 'PICKLE'
 # The implementation of data collectors are located in ./icarus/execution/collectors.py
 DATA_COLLECTORS = ['CACHE_HIT_RATIO', 'LATENCY']
 
-# Queue of experiments
-EXPERIMENT_QUEUE = deque()
-
 # Create experiment
 default = Tree()
 
@@ -52,7 +49,7 @@ default['workload'] = {
         }
 
 # mindestens 1 objekt pro cache, d.h. 6 objekte; 6/34465 = 0.00017408965
-# warum 56595 objekte in contentWriteTimes
+# contentsWriteTimes.txt holds 56595 objects, wc -l shows 56594 because the file has no trailing newline (see trace/catalogue.py)
 N_CONTENTS = 56595
 N_CACHES = 6
 
@@ -83,11 +80,7 @@ STRATEGIES = [
     'PCASTING',
 ]
 
-for strategy in STRATEGIES:
-    for network_cache in NETWORK_CACHE:
-        experiment = copy.deepcopy(default)
-        experiment['strategy']['name'] = strategy
-        experiment['cache_placement']['network_cache'] = network_cache
-        # experiment['workload']['alpha'] = 1.0
-        experiment['desc'] = f'DS2OS topology, {strategy} placement strategy, LRU replacement, {network_cache} network cache'
-        EXPERIMENT_QUEUE.append(experiment)
+# Queue of experiments, built lazily from default (see sim/sweep.py)
+EXPERIMENT_QUEUE = Sweep(default, desc='DS2OS topology, {strategy} placement strategy, LRU replacement, {network_cache} network cache')
+EXPERIMENT_QUEUE.axis('strategy', 'strategy.name', STRATEGIES)
+EXPERIMENT_QUEUE.axis('network_cache', 'cache_placement.network_cache', NETWORK_CACHE)
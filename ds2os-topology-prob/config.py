@@ -1,10 +1,14 @@
 from multiprocessing import cpu_count
-from collections import deque
-import copy
 from icarus.util import Tree
 
 import icarus.models as cache
 
+import ds2os
+from sweep import Sweep
+
+# DS2OS workloads emit interned integer content IDs instead of name strings
+ds2os.install()
+
 # GENERAL SETTINGS
 
 # Level of logging output
@@ -35,9 +39,6 @@ RESULTS_FORMAT = 'PICKLE'
 # The implementation of data collectors are located in ./icarus/execution/collectors.py
 DATA_COLLECTORS = ['CACHE_HIT_RATIO', 'LATENCY']
 
-# Queue of experiments
-EXPERIMENT_QUEUE = deque()
-
 # Create experiment
 default = Tree()
 
@@ -52,7 +53,7 @@ default['workload'] = {
         }
 
 # mindestens 1 objekt pro cache, d.h. 6 objekte; 6/34465 = 0.00017408965
-# warum 56595 objekte in contentWriteTimes
+# contentsWriteTimes.txt holds 56595 objects, wc -l shows 56594 because the file has no trailing newline (see trace/catalogue.py)
 N_CONTENTS = 56595
 N_CACHES = 6
 
@@ -80,12 +81,9 @@ P = [
 ]
 
 # caching meta-policies / placement strategies
-for network_cache in NETWORK_CACHE:
-    for p in P:
-        experiment = copy.deepcopy(default)
-        experiment['cache_placement']['network_cache'] = network_cache
-        experiment['strategy']['name'] = 'RAND_BERNOULLI'
-        experiment['strategy']['p']    = p
-        # experiment['workload']['alpha'] = 1.0
-        experiment['desc'] = f'DS2OS topology, Prob({p}) placement strategy, LRU replacement, {network_cache} network cache'
-        EXPERIMENT_QUEUE.append(experiment)
+default['strategy']['name'] = 'RAND_BERNOULLI'
+
+# Queue of experiments, built lazily from default (see sim/sweep.py)
+EXPERIMENT_QUEUE = Sweep(default, desc='DS2OS topology, Prob({p}) placement strategy, LRU replacement, {network_cache} network cache')
+EXPERIMENT_QUEUE.axis('network_cache', 'cache_placement.network_cache', NETWORK_CACHE)
+EXPERIMENT_QUEUE.axis('p', 'strategy.p', P)
@@ -1,8 +1,8 @@
 from multiprocessing import cpu_count
-from collections import deque
-import copy
 from icarus.util import Tree
 
+from sweep import Sweep
+
 import icarus.models as cache
 
 import csv
@@ -40,9 +40,6 @@ RESULTS_FORMAT = 'PICKLE'
 # The implementation of data collectors are located in ./icarus/execution/collectors.py
 DATA_COLLECTORS = ['CACHE_HIT_RATIO', 'LATENCY']
 
-# Queue of experiments
-EXPERIMENT_QUEUE = deque()
-
 # Create experiment
 default = Tree()
 
@@ -77,31 +74,29 @@ default['strategy']['name'] = 'LCE'
 
 # Cache replacement policies
 REPLACEMENT_POLICIES = [
-    # 'MIN', # think this might not work when capacity == 1 at every cache
+    'MIN', # offline optimum, sim/policies.py (needs sim/run.py)
     'NULL',
     'FIFO',
     'LRU',
     'PERFECT_LFU',
     'IN_CACHE_LFU',
     'SLRU', # needs at least 2 segments to make sense, i.e. also at least 2 objects in each cache
-    'MDMR', # many producers only offer one content chunk address // could extend to location, i.e. replace data from garage for data from garage etc.
+    'MDMR', # many producers only offer one content chunk address, cache_policy 'group': 'location' replaces garage data with garage data instead
     'LFF',
     # 'DS2OS_PERFECT_LFU',
     # 'IN_CACHE_LFU_EVICT_FIRST', # performs worse then In-cache LFU
     'RAND',
 ]
 
-# problem: we register 'TTL' and pass 'cache' and 'f_time' as arguments, however, the NetworkModel init assumes for every node a cache_size[node] as maxlen parameter, e.g. LruCache(10)
-# we want the call to be ttl_cache(LruCache(10), f_time) but it does ttl_cache(10, LruCache(10), f_time) instead
-# solved: manually changed in network.py
-for policy in REPLACEMENT_POLICIES:
-    for network_cache in NETWORK_CACHE:
-        experiment = copy.deepcopy(default)
-        experiment['cache_policy']['name'] = policy
-        experiment['cache_placement']['network_cache'] = network_cache
-        experiment['desc'] = f'DS2OS topology, LCE placement strategy, {policy} replacement, {network_cache} network cache'
-        # segments must be an integer and 0 < segments <= maxlen
-        # alternatively manually set segments = 1; default is 2
-        if policy == 'SLRU' and network_cache * N_CONTENTS <= 6: # 6 KAs in the network
-            experiment['cache_policy']['segments'] = 1
-        EXPERIMENT_QUEUE.append(experiment)
+# TinyLFU admission: cache_policy {'name': 'TINY_LFU', 'policy': 'LRU'} keeps one-hit versions out of LRU, FIFO,
+# SLRU or RAND caches, see sim/admission.py (needs sim/run.py)
+# TTL caching: cache_policy {'name': 'TTL', 'policy': 'LRU', 'ttl_source': 'writetimes'} expires every
+# version at its nextWrite, other TTL sources in sim/ttl.py (needs sim/run.py)
+
+# Queue of experiments, built lazily from default (see sim/sweep.py)
+EXPERIMENT_QUEUE = Sweep(default, desc='DS2OS topology, LCE placement strategy, {policy} replacement, {network_cache} network cache')
+EXPERIMENT_QUEUE.axis('policy', 'cache_policy.name', REPLACEMENT_POLICIES)
+EXPERIMENT_QUEUE.axis('network_cache', 'cache_placement.network_cache', NETWORK_CACHE)
+# segments must be an integer and 0 < segments <= maxlen, default is 2
+EXPERIMENT_QUEUE.override('cache_policy.segments', 1,
+                          when=lambda p: p['policy'] == 'SLRU' and p['network_cache'] * N_CONTENTS <= 6) # 6 KAs in the network
@@ -98,18 +98,11 @@ lce['strategy']['name'] = 'LCE'
 
 cache_policy = Tree()
 
-# problem: we register 'TTL' and pass 'cache' and 'f_time' as arguments, however, the NetworkModel init assumes for every node a cache_size[node] as maxlen parameter, e.g. LruCache(10)
-# we want the call to be ttl_cache(LruCache(10), f_time) but it does ttl_cache(10, LruCache(10), f_time) instead
-# solved: manually changed in network.py
-
-# how to get a good f_time function
-
-# in engine.py > exec_experiment, strategy_inst.process_event must be passed time, event where event has ttl or expires values
-# time is a float type
-
-# cache_policy['name']   = 'TTL'
-# cache_policy['cache']  = cache.FifoCache(5)
-# cache_policy['f_time'] = lambda: 1
+# TTL caching wraps any policy, expiring contents on the simulated clock (see sim/ttl.py, needs sim/run.py)
+# cache_policy['name']       = 'TTL'
+# cache_policy['policy']     = 'FIFO'
+# cache_policy['ttl_source'] = 'constant'
+# cache_policy['ttl']        = 1
 
 print("the cache policy is", cache_policy)
 
@@ -0,0 +1,235 @@
+"""TinyLFU admission in front of an eviction policy.
+
+With LCE every miss is inserted, and in the DS2OS trace most versions are
+requested once before being superseded, so small caches fill up with
+one-hit wonders. TINY_LFU (registered as a cache policy) wraps an eviction
+policy and lets a new content in only if it has been requested more often
+than the victim it would displace (Einziger et al., TinyLFU).
+
+Request frequencies are estimated by a count-min sketch of 4-bit counters
+(FrequencySketch) that halves all counters every `sample` recorded requests,
+so old popularity fades. Its size is fixed when the cache is built, and the
+wrapped policy is used as is:
+
+ * LRU, FIFO: the victim is the oldest entry of a shadow OrderedDict
+             following the policy's order, once the cache is full
+ * SLRU:      the victim is the bottom of its last (probationary) segment,
+             once that segment is full (see SlruCache.victim())
+ * RAND:      the content is inserted and the insertion undone if the
+              victim drawn turns out more frequent
+
+A content whose insertion would evict nothing is always admitted.
+
+Contents are hashed into the sketch by value (ints as they are, strings by
+BLAKE2b), so results do not depend on PYTHONHASHSEED.
+
+A rejected content is returned by put, as if evicted right away.
+
+cache_policy:
+ * policy: the eviction policy (default 'LRU'), further arguments are
+           passed along to it
+ * width:  counters per sketch row (default: the power of two >= 8 * maxlen)
+ * depth:  sketch rows (default 4)
+ * sample: recorded requests between agings (default 10 * width)
+"""
+import collections
+import hashlib
+
+import numpy as np
+
+from icarus.models.cache import Cache, SegmentedLruCache
+from icarus.registry import CACHE_POLICY, register_cache_policy
+from icarus.util import inheritdoc
+
+# policies whose victim is known before inserting, and those checked by
+# undoing the insertion
+TAIL_VICTIM_POLICIES = ('LRU', 'FIFO', 'SLRU')
+UNDO_POLICIES = ('RAND',)
+
+# policies mirrored by a shadow order, and whether a hit refreshes a content
+SHADOW_POLICIES = {'LRU': True, 'FIFO': False}
+
+COUNTER_MAX = 15
+
+_MASK64 = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_SEEDS = (0x243F6A8885A308D3, 0x13198A2E03707344, 0xA4093822299F31D0, 0x082EFA98EC4E6C89,
+          0x452821E638D01377, 0xBE5466CF34E90C6C, 0xC0AC29B7C97C50DD, 0x3F84D5B5B5470917)
+
+
+def stable_hash(k):
+    """64-bit hash of a content that is the same in every process"""
+    if isinstance(k, int):
+        return k & _MASK64
+    if not isinstance(k, bytes):
+        k = (k if isinstance(k, str) else repr(k)).encode()
+    return int.from_bytes(hashlib.blake2b(k, digest_size=8).digest(), 'little')
+
+
+class FrequencySketch(object):
+    """Count-min sketch of saturating 4-bit counters with periodic aging.
+
+    The counters are one uint8 array of depth rows by width columns,
+    accessed through a memoryview. After every `sample` increments all
+    counters are halved.
+    """
+
+    def __init__(self, width, depth=4, sample=None):
+        if depth > len(_SEEDS):
+            raise ValueError(f'depth must be at most {len(_SEEDS)}')
+        bits = max(int(width) - 1, 1).bit_length()
+        self.width = 1 << bits
+        self.depth = depth
+        self.sample = sample or 10 * self.width
+        self._shift = 64 - bits
+        self._counters = np.zeros(self.depth * self.width, dtype=np.uint8)
+        self._view = self._counters.data
+        self._offsets = [row * self.width for row in range(self.depth)]
+        self.additions = 0
+
+    def nbytes(self):
+        return self._counters.nbytes
+
+    def _indexes(self, k):
+        h = stable_hash(k)
+        shift = self._shift
+        return [offset + ((((h ^ seed) * _GOLDEN) & _MASK64) >> shift)
+                for offset, seed in zip(self._offsets, _SEEDS)]
+
+    def estimate(self, k):
+        view = self._view
+        return min(view[i] for i in self._indexes(k))
+
+    def increment(self, k):
+        view = self._view
+        for i in self._indexes(k):
+            if view[i] < COUNTER_MAX:
+                view[i] += 1
+        self.additions += 1
+        if self.additions >= self.sample:
+            self._counters >>= 1
+            self.additions //= 2
+
+    def clear(self):
+        self._counters[:] = 0
+        self.additions = 0
+
+
+class SlruCache(SegmentedLruCache):
+    """Segmented LRU cache telling which content its next insertion evicts"""
+
+    def victim(self):
+        """Return the content a put of a new content would evict, None if
+        the put would not evict anything.
+
+        New contents enter the last (probationary) segment, which evicts its
+        bottom when full even if the protected segments have room.
+        """
+        probation = self._segment[-1]
+        if len(probation) < probation.maxlen:
+            return None
+        return probation._cache.bottom
+
+
+# policies built by a subclass exposing victim()
+VICTIM_CACHES = {'SLRU': SlruCache}
+
+
+@register_cache_policy('TINY_LFU')
+class TinyLfuCache(Cache):
+    """Eviction policy behind a TinyLFU admission filter"""
+
+    @inheritdoc(Cache)
+    def __init__(self, maxlen, policy='LRU', width=None, depth=4, sample=None, **kwargs):
+        if policy not in TAIL_VICTIM_POLICIES + UNDO_POLICIES:
+            raise ValueError(f'policy must be one of {", ".join(TAIL_VICTIM_POLICIES + UNDO_POLICIES)}')
+        self._cache = VICTIM_CACHES.get(policy, CACHE_POLICY[policy])(maxlen, **kwargs)
+        self._undo = policy in UNDO_POLICIES
+        # contents in eviction order, oldest first
+        self._order = collections.OrderedDict() if policy in SHADOW_POLICIES else None
+        self._refresh = SHADOW_POLICIES.get(policy, False)
+        self.sketch = FrequencySketch(width or 8 * self._cache.maxlen, depth, sample)
+        self.rejected = 0
+
+    @inheritdoc(Cache)
+    def __len__(self):
+        return len(self._cache)
+
+    @property
+    @inheritdoc(Cache)
+    def maxlen(self):
+        return self._cache.maxlen
+
+    @inheritdoc(Cache)
+    def dump(self):
+        return self._cache.dump()
+
+    @inheritdoc(Cache)
+    def position(self, k):
+        return self._cache.position(k)
+
+    @inheritdoc(Cache)
+    def has(self, k):
+        return self._cache.has(k)
+
+    @inheritdoc(Cache)
+    def get(self, k):
+        self.sketch.increment(k)
+        hit = self._cache.get(k)
+        if hit and self._refresh:
+            self._order.move_to_end(k)
+        return hit
+
+    def _admit(self, k, victim):
+        return self.sketch.estimate(k) > self.sketch.estimate(victim)
+
+    def _victim(self):
+        if self._order is None:
+            return self._cache.victim()
+        if len(self._order) < self._cache.maxlen:
+            return None
+        return next(iter(self._order))
+
+    def _put(self, k):
+        evicted = self._cache.put(k)
+        order = self._order
+        if order is not None:
+            if k not in order:
+                order[k] = None
+            elif self._refresh:
+                order.move_to_end(k)
+            if evicted is not None:
+                del order[evicted]
+        return evicted
+
+    @inheritdoc(Cache)
+    def put(self, k):
+        cache = self._cache
+        if cache.has(k):
+            return self._put(k)
+        if not self._undo:
+            victim = self._victim()
+            if victim is not None and not self._admit(k, victim):
+                self.rejected += 1
+                return k
+            return self._put(k)
+        evicted = cache.put(k)
+        if evicted is None or evicted == k or self._admit(k, evicted):
+            return evicted
+        cache.remove(k)
+        cache.put(evicted)
+        self.rejected += 1
+        return k
+
+    @inheritdoc(Cache)
+    def remove(self, k):
+        if self._order is not None:
+            self._order.pop(k, None)
+        return self._cache.remove(k)
+
+    @inheritdoc(Cache)
+    def clear(self):
+        self._cache.clear()
+        if self._order is not None:
+            self._order.clear()
+        self.sketch.clear()
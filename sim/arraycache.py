@@ -0,0 +1,247 @@
+"""Array-backed cache store for large topologies.
+
+The Icarus caches keep their contents in dicts and linked lists of Python
+objects, a few hundred bytes per entry. ArrayCache (registered as 'ARRAY')
+keeps a node's contents in preallocated NumPy slot arrays instead:
+
+ * keys:       int64 content ID per slot, slots 0..len-1 are in use
+ * prev/next:  int32 recency (LRU) or insertion (FIFO) list over the slots
+ * index:      int32 open-addressing table (linear probing, backward-shift
+               deletion) from content ID to slot + 1, twice the capacity
+
+so an entry costs about 32 bytes and lookups and inserts allocate nothing.
+The arrays are accessed through memoryviews, which hand out plain ints.
+Removing an entry moves the last slot into the hole, so used slots stay
+contiguous and RAND draws its victim from them directly.
+
+Content IDs from ds2os.install() are stored as they are, other keys are
+interned on the way in (see interning.py) and named again by dump().
+
+cache_policy:
+ * policy: 'LRU' (default), 'FIFO' or 'RAND'
+ * seed:   seed of the RAND victim choice
+"""
+import random
+
+import numpy as np
+
+from icarus.models.cache import Cache
+from icarus.registry import register_cache_policy
+from icarus.util import inheritdoc
+
+import ds2os
+
+ARRAY_POLICIES = ('LRU', 'FIFO', 'RAND')
+
+NIL = -1
+
+_HASH = 2654435761
+
+
+@register_cache_policy('ARRAY')
+class ArrayCache(Cache):
+    """LRU, FIFO or RAND cache on preallocated slot arrays"""
+
+    @inheritdoc(Cache)
+    def __init__(self, maxlen, policy='LRU', seed=None, **kwargs):
+        self._maxlen = int(maxlen)
+        if self._maxlen <= 0:
+            raise ValueError('maxlen must be positive')
+        if policy not in ARRAY_POLICIES:
+            raise ValueError(f'policy must be one of {", ".join(ARRAY_POLICIES)}')
+        self.policy = policy
+        self._recency = policy == 'LRU'
+        self._linked = policy != 'RAND'
+        self._random = random.Random(seed)
+        n = self._maxlen + 1
+        size = 1
+        while size < 2 * n:
+            size *= 2
+        self._mask = size - 1
+        self._arrays = {
+            'keys': np.full(n, NIL, dtype=np.int64),
+            'prev': np.full(n, NIL, dtype=np.int32),
+            'next': np.full(n, NIL, dtype=np.int32),
+            'index': np.zeros(size, dtype=np.int32),
+        }
+        self._keys = self._arrays['keys'].data
+        self._prev = self._arrays['prev'].data
+        self._next = self._arrays['next'].data
+        self._index = self._arrays['index'].data
+        self._len = 0
+        self._head = NIL
+        self._tail = NIL
+        self._table = None
+
+    def nbytes(self):
+        """Bytes held by the slot arrays and the index"""
+        return sum(a.nbytes for a in self._arrays.values())
+
+    def _id(self, k):
+        if type(k) is int:
+            return k
+        if self._table is None:
+            self._table = ds2os.content_table()
+        return self._table.intern(k)
+
+    def _key(self, i):
+        return i if self._table is None else self._table.name(i)
+
+    def _find(self, k):
+        """Return (index position, slot) of content ID k, slot NIL if absent"""
+        index = self._index
+        keys = self._keys
+        mask = self._mask
+        i = (k * _HASH) & mask
+        s = index[i]
+        while s and keys[s - 1] != k:
+            i = (i + 1) & mask
+            s = index[i]
+        return i, s - 1
+
+    def _unindex(self, i):
+        index = self._index
+        keys = self._keys
+        mask = self._mask
+        index[i] = 0
+        j = i
+        while True:
+            j = (j + 1) & mask
+            s = index[j]
+            if not s:
+                return
+            h = (keys[s - 1] * _HASH) & mask
+            # leave entries whose home lies cyclically in (i, j]
+            if (i < h <= j) if i <= j else (h > i or h <= j):
+                continue
+            index[i] = s
+            index[j] = 0
+            i = j
+
+    def _link_head(self, s):
+        self._prev[s] = NIL
+        self._next[s] = self._head
+        if self._head != NIL:
+            self._prev[self._head] = s
+        else:
+            self._tail = s
+        self._head = s
+
+    def _unlink(self, s):
+        p = self._prev[s]
+        n = self._next[s]
+        if p != NIL:
+            self._next[p] = n
+        else:
+            self._head = n
+        if n != NIL:
+            self._prev[n] = p
+        else:
+            self._tail = p
+
+    def _free(self, i, s):
+        """Drop the entry at index position i and slot s, refilling the slot
+        with the last one
+        """
+        if self._linked:
+            self._unlink(s)
+        self._unindex(i)
+        last = self._len - 1
+        if s != last:
+            k = self._keys[last]
+            self._keys[s] = k
+            if self._linked:
+                p = self._prev[last]
+                n = self._next[last]
+                self._prev[s] = p
+                self._next[s] = n
+                if p != NIL:
+                    self._next[p] = s
+                else:
+                    self._head = s
+                if n != NIL:
+                    self._prev[n] = s
+                else:
+                    self._tail = s
+            self._index[self._find(k)[0]] = s + 1
+        self._keys[last] = NIL
+        self._len = last
+
+    @inheritdoc(Cache)
+    def __len__(self):
+        return self._len
+
+    @property
+    @inheritdoc(Cache)
+    def maxlen(self):
+        return self._maxlen
+
+    @inheritdoc(Cache)
+    def dump(self):
+        if not self._linked:
+            return [self._key(self._keys[s]) for s in range(self._len)]
+        res = []
+        s = self._head
+        while s != NIL:
+            res.append(self._key(self._keys[s]))
+            s = self._next[s]
+        return res
+
+    @inheritdoc(Cache)
+    def position(self, k):
+        if not self.has(k):
+            raise ValueError('The item %s is not in the cache' % str(k))
+        return self.dump().index(k)
+
+    @inheritdoc(Cache)
+    def has(self, k):
+        return self._find(self._id(k))[1] != NIL
+
+    @inheritdoc(Cache)
+    def get(self, k):
+        s = self._find(self._id(k))[1]
+        if s == NIL:
+            return False
+        if self._recency and s != self._head:
+            self._unlink(s)
+            self._link_head(s)
+        return True
+
+    @inheritdoc(Cache)
+    def put(self, k):
+        k = self._id(k)
+        i, s = self._find(k)
+        if s != NIL:
+            if self._recency and s != self._head:
+                self._unlink(s)
+                self._link_head(s)
+            return None
+        s = self._len
+        self._keys[s] = k
+        self._index[i] = s + 1
+        self._len += 1
+        if self._linked:
+            self._link_head(s)
+        if self._len <= self._maxlen:
+            return None
+        # RAND never evicts the content just inserted, which sits in the last slot
+        victim = self._tail if self._linked else self._random.randrange(self._len - 1)
+        evicted = self._keys[victim]
+        self._free(self._find(evicted)[0], victim)
+        return self._key(evicted)
+
+    @inheritdoc(Cache)
+    def remove(self, k):
+        i, s = self._find(self._id(k))
+        if s == NIL:
+            return False
+        self._free(i, s)
+        return True
+
+    @inheritdoc(Cache)
+    def clear(self):
+        self._arrays['keys'][:] = NIL
+        self._arrays['index'][:] = 0
+        self._len = 0
+        self._head = NIL
+        self._tail = NIL
@@ -0,0 +1,92 @@
+"""Icarus extensions for the DS2OS trace experiments.
+
+Import this module from a config.py (sim/ is on sys.path for sim/run.py
+and plotresults.py, see paths.py) and call install() to make the DS2OS and DS2OSNoVersions workloads
+emit integer content IDs from the shared intern table (trace/interned.txt)
+instead of content name strings. Caches, the content-source map and the data
+collectors then hash small ints on every hop instead of long strings.
+
+The workload and content placement keep their registered names, so result
+filters and plots written against 'DS2OS' are unaffected. Cache policies
+that parse content names must go through the table (see content_table()).
+"""
+from icarus.registry import WORKLOAD, CONTENT_PLACEMENT
+
+import paths
+import interning
+
+INTERNED_WORKLOADS = ['DS2OS', 'DS2OSNoVersions']
+
+INTERNED_CONTENT_PLACEMENTS = ['DS2OS']
+
+
+_addresses = {}
+
+
+def content_table():
+    """Return the process-wide content intern table"""
+    return interning.load_table()
+
+
+def content_address(k):
+    """Return the address ID of an interned content ID or a content name"""
+    table = interning.load_table()
+    if type(k) is int:
+        return table.address_of[k]
+    a = _addresses.get(k)
+    if a is None:
+        a = _addresses[k] = table.intern_address(interning.split_content(k)[0])
+    return a
+
+
+class InternedWorkload(object):
+    """Wrap a workload so that contents and events carry interned IDs"""
+
+    def __init__(self, workload, table):
+        self.workload = workload
+        self.table = table
+        self.contents = [table.intern(c) for c in workload.contents]
+        for attr in ('receivers', 'n_contents'):
+            if hasattr(workload, attr):
+                setattr(self, attr, getattr(workload, attr))
+
+    def __iter__(self):
+        ids = self.table.ids
+        intern = self.table.intern
+        for t, event in self.workload:
+            content = event['content']
+            i = ids.get(content)
+            event['content'] = intern(content) if i is None else i
+            yield t, event
+
+
+def interned_workload(workload_cls):
+    def workload(topology, **kwargs):
+        return InternedWorkload(workload_cls(topology, **kwargs), content_table())
+    workload.interned = True
+    return workload
+
+
+def interned_content_placement(placement):
+    def content_placement(topology, contents, **kwargs):
+        table = content_table()
+        placement(topology, [table.name(c) for c in contents], **kwargs)
+        for v in topology.nodes():
+            stack = topology.nodes[v].get('stack')
+            if stack and 'contents' in stack[1]:
+                stack[1]['contents'] = set(table.intern(c) for c in stack[1]['contents'])
+    content_placement.interned = True
+    return content_placement
+
+
+def install():
+    """Switch the DS2OS workloads and content placement to interned IDs.
+
+    Calling it more than once is harmless.
+    """
+    for name in INTERNED_WORKLOADS:
+        if name in WORKLOAD and not getattr(WORKLOAD[name], 'interned', False):
+            WORKLOAD[name] = interned_workload(WORKLOAD[name])
+    for name in INTERNED_CONTENT_PLACEMENTS:
+        if name in CONTENT_PLACEMENT and not getattr(CONTENT_PLACEMENT[name], 'interned', False):
+            CONTENT_PLACEMENT[name] = interned_content_placement(CONTENT_PLACEMENT[name])
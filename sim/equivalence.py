@@ -0,0 +1,129 @@
+"""Equivalence classes of experiments that must produce the same results.
+
+Campaign grids contain experiments that cannot differ, e.g. every cache size
+of the NULL policy. representative() maps an experiment to a canonical form
+shared by all experiments it is provably equivalent to, using declared
+properties of strategies and policies:
+
+ * NO_CACHE never touches a cache, so cache_policy and cache_placement do
+   not matter
+ * NULL caches never hold anything, so with an on-path strategy the run
+   equals NO_CACHE. Strategies drawing random numbers (RAND_BERNOULLI, ...)
+   only qualify with trace workloads, whose requests draw none.
+ * caches of one object behave alike under every policy in SINGLE_SLOT_LRU:
+   a hit leaves the content in place and an insertion replaces it. Cache
+   sizes are computed from the topology, workload and cache placement.
+
+run.py simulates one experiment per class and copies its results to the
+others (disable with --no-prune).
+"""
+import functools
+import json
+import logging
+
+from icarus.registry import TOPOLOGY_FACTORY, WORKLOAD
+
+import ds2os
+import stackdist
+
+logger = logging.getLogger('equivalence')
+
+# strategies serving every request along the shortest path to the source,
+# without touching the random stream
+DETERMINISTIC_ON_PATH_STRATEGIES = {'NO_CACHE', 'LCE', 'LCD', 'CL4M', 'EDGE'}
+
+# strategies as above, except that they draw random numbers for caching
+RANDOM_ON_PATH_STRATEGIES = {'PROB_CACHE', 'RAND_BERNOULLI', 'RAND_CHOICE'}
+
+# workloads replaying a trace, drawing no random numbers
+TRACE_WORKLOADS = set(ds2os.INTERNED_WORKLOADS)
+
+# policy name -> argument -> values letting it act as LRU in a one-object
+# cache, None if the argument may be left out
+SINGLE_SLOT_LRU = {
+    'LRU': {},
+    'FIFO': {},
+    'SLRU': {'segments': (1,)},
+    'ARRAY': {'policy': (None, 'LRU', 'FIFO')},
+}
+
+
+def _canonical(tree):
+    return json.dumps(tree, sort_keys=True, default=repr)
+
+
+def _plain(tree):
+    return {k: _plain(v) if isinstance(v, dict) else v for k, v in tree.items()}
+
+
+def is_single_slot_lru(cache_policy):
+    """True if the policy behaves like LRU in caches holding one object"""
+    args = dict(cache_policy)
+    required = SINGLE_SLOT_LRU.get(args.pop('name', None))
+    if required is None:
+        return False
+    for name, allowed in required.items():
+        if args.pop(name, None) not in allowed:
+            return False
+    # other arguments (e.g. a seed) are not known to be harmless
+    return not args
+
+
+@functools.lru_cache(maxsize=None)
+def _network(spec):
+    tree = json.loads(spec)
+    topology_spec = tree['topology']
+    topology = TOPOLOGY_FACTORY[topology_spec.pop('name')](**topology_spec)
+    workload_spec = tree['workload']
+    workload = WORKLOAD[workload_spec.pop('name')](topology, **workload_spec)
+    return topology, workload
+
+
+@functools.lru_cache(maxsize=None)
+def _max_cache_size(network_spec, cachepl_spec):
+    # the topology and workload are built once per network, cache_sizes
+    # places the caches on a copy
+    topology, workload = _network(network_spec)
+    _, sizes = stackdist.cache_sizes(topology, workload, json.loads(cachepl_spec))
+    return max(sizes.values(), default=0)
+
+
+def max_cache_size(experiment):
+    """Largest cache of the experiment's network, None if unknown"""
+    if 'network_cache' not in experiment.get('cache_placement', {}):
+        return None
+    try:
+        network_spec = _canonical({k: _plain(experiment[k]) for k in ('topology', 'workload')})
+        return _max_cache_size(network_spec, _canonical(_plain(experiment['cache_placement'])))
+    except Exception as e:
+        logger.debug('Cache sizes unknown (%s: %s)', type(e).__name__, e)
+        return None
+
+
+def representative(experiment):
+    """Canonical form of the experiment, equal for equivalent experiments"""
+    tree = _plain(experiment)
+    tree.pop('desc', None)
+    strategy = tree.get('strategy', {}).get('name')
+    policy = tree.get('cache_policy', {})
+    on_path = strategy in DETERMINISTIC_ON_PATH_STRATEGIES or (
+        strategy in RANDOM_ON_PATH_STRATEGIES and tree.get('workload', {}).get('name') in TRACE_WORKLOADS)
+    if strategy == 'NO_CACHE' or (policy.get('name') == 'NULL' and on_path):
+        tree['strategy'] = {'name': 'NO_CACHE'}
+        tree.pop('cache_policy', None)
+        tree.pop('cache_placement', None)
+    elif is_single_slot_lru(policy) and max_cache_size(experiment) == 1:
+        tree['cache_policy'] = {'name': 'LRU'}
+    return tree
+
+
+def equivalence_key(experiment):
+    return _canonical(representative(experiment))
+
+
+def classes(experiments):
+    """Group experiments into equivalence classes, in queue order"""
+    groups = {}
+    for experiment in experiments:
+        groups.setdefault(equivalence_key(experiment), []).append(experiment)
+    return list(groups.values())
@@ -0,0 +1,94 @@
+"""Crash-safe journal of finished experiments.
+
+The results file is written once the whole campaign is done, so a crash or
+an OOM kill used to lose every experiment run so far. run.py appends each
+finished experiment to a journal beside the results file
+(results.pickle.journal) and, with --resume, reloads it and runs only the
+experiments missing from it. The journal is removed once the results file
+is written.
+
+Records are keyed like the result store (see memo.py), code version
+included, so a journal written by other code is not resumed from. Each
+record is a pickled (key, params, results) preceded by its length,
+appended with a single write and synced to disk. A record cut short by a
+crash is dropped, and cut off when the journal is reopened.
+"""
+import logging
+import os
+import pickle
+import struct
+
+import memo
+
+logger = logging.getLogger('journal')
+
+_HEADER = struct.Struct('<Q')
+
+
+def read_records(path):
+    """Return the complete records of a journal and the length they span"""
+    records = []
+    end = 0
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return records, end
+    while end + _HEADER.size <= len(data):
+        size, = _HEADER.unpack_from(data, end)
+        start = end + _HEADER.size
+        if start + size > len(data):
+            break
+        try:
+            records.append(pickle.loads(data[start:start + size]))
+        except Exception:
+            break
+        end = start + size
+    return records, end
+
+
+class Journal(object):
+    """Append-only log of finished experiments, looked up like ResultStore"""
+
+    def __init__(self, path, collectors=(), resume=False):
+        self.path = path
+        self.collectors = list(collectors)
+        self.done = {}
+        if resume:
+            records, end = read_records(path)
+            for key, params, results in records:
+                self.done[key] = results
+            if os.path.exists(path) and end < os.path.getsize(path):
+                logger.warning('Dropping an incomplete record at the end of %s', path)
+                os.truncate(path, end)
+            logger.info('Resuming with %d experiments from %s', len(self.done), path)
+        elif os.path.exists(path):
+            logger.info('Discarding the journal of an earlier run in %s (see --resume)', path)
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | (0 if resume else os.O_TRUNC), 0o644)
+
+    def __len__(self):
+        return len(self.done)
+
+    def _key(self, experiment, replication):
+        return memo.experiment_key(experiment, self.collectors, replication, memo.code_version())
+
+    def get(self, experiment, replication=0):
+        """Return the journaled results of an experiment, None if missing"""
+        return self.done.get(self._key(experiment, replication))
+
+    def put(self, experiment, results, replication=0):
+        key = self._key(experiment, replication)
+        payload = pickle.dumps((key, experiment, results), protocol=pickle.HIGHEST_PROTOCOL)
+        os.write(self._fd, _HEADER.pack(len(payload)) + payload)
+        os.fsync(self._fd)
+        self.done[key] = results
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def remove(self):
+        """Close and delete the journal, once the results are saved"""
+        self.close()
+        os.remove(self.path)
@@ -0,0 +1,91 @@
+"""Lock-step replay of experiments that differ only in their cache policy.
+
+A replacement campaign runs the same topology, workload and strategy once
+per policy, each run decoding and routing every request again. run_lockstep()
+builds the scenario and the shortest paths once, sets up one network model,
+strategy and set of collectors per policy, and hands every event of the
+single workload pass to all of them in turn, producing one result per
+experiment.
+
+Each policy instance sees exactly the calls it would see in a run of its
+own, so results are identical to separate runs for deterministic policies
+and strategies. Components drawing from the global random stream (e.g.
+RAND, RAND_BERNOULLI, PROB_CACHE) draw from one interleaved stream instead,
+which only changes their realization.
+"""
+import copy
+import logging
+import time
+
+from icarus.execution import NetworkModel, NetworkView, NetworkController
+from icarus.execution.collectors import CollectorProxy
+from icarus.orchestration import run_scenario
+from icarus.registry import (TOPOLOGY_FACTORY, WORKLOAD, CACHE_PLACEMENT, CONTENT_PLACEMENT,
+                             STRATEGY, DATA_COLLECTOR)
+
+logger = logging.getLogger('lockstep')
+
+
+def run_lockstep(settings, experiments, curr_exp=0, n_exp=0):
+    """Run experiments differing only in cache_policy over one workload pass.
+
+    Returns a list of (params, results, duration) like
+    icarus.orchestration.run_scenario. If the joint run fails, the
+    experiments are run one by one so a failing policy only loses its own
+    result.
+    """
+    start = time.time()
+    try:
+        results = _lockstep(settings, experiments)
+    except Exception as e:
+        logger.error('Lock-step run of %d experiments failed (%s: %s), running them separately',
+                     len(experiments), type(e).__name__, e)
+        res = []
+        for i, experiment in enumerate(experiments):
+            r = run_scenario(settings, experiment, curr_exp + i, n_exp)
+            if r is not None:
+                res.append(r)
+        return res
+    duration = (time.time() - start) / len(experiments)
+    logger.info('Ran %d cache policies in lock-step', len(experiments))
+    return [(experiment, r, duration) for experiment, r in zip(experiments, results)]
+
+
+def _lockstep(settings, experiments):
+    tree = copy.deepcopy(experiments[0])
+    topology_spec = dict(tree['topology'])
+    topology = TOPOLOGY_FACTORY[topology_spec.pop('name')](**topology_spec)
+    workload_spec = dict(tree['workload'])
+    workload = WORKLOAD[workload_spec.pop('name')](topology, **workload_spec)
+    if 'cache_placement' in tree:
+        cachepl_spec = dict(tree['cache_placement'])
+        cachepl_name = cachepl_spec.pop('name')
+        cachepl_spec['cache_budget'] = workload.n_contents * cachepl_spec.pop('network_cache')
+        CACHE_PLACEMENT[cachepl_name](topology, **cachepl_spec)
+    if 'content_placement' in tree:
+        contpl_spec = dict(tree['content_placement'])
+        CONTENT_PLACEMENT[contpl_spec.pop('name')](topology, workload.contents, **contpl_spec)
+    netconf = dict(tree.get('netconf', {}))
+    strategy_spec = dict(tree['strategy'])
+    strategy_name = strategy_spec.pop('name')
+
+    shortest_path = None
+    strategies = []
+    proxies = []
+    for experiment in experiments:
+        model = NetworkModel(topology, copy.deepcopy(dict(experiment['cache_policy'])),
+                             shortest_path=shortest_path, **netconf)
+        # routing is computed once and shared by all models
+        shortest_path = model.shortest_path
+        view = NetworkView(model)
+        controller = NetworkController(model)
+        collectors = [DATA_COLLECTOR[name](view) for name in settings.DATA_COLLECTORS]
+        proxy = CollectorProxy(view, collectors)
+        controller.attach_collector(proxy)
+        strategies.append(STRATEGY[strategy_name](view, controller, **strategy_spec))
+        proxies.append(proxy)
+
+    for t, event in workload:
+        for strategy in strategies:
+            strategy.process_event(t, **event)
+    return [proxy.results() for proxy in proxies]
@@ -0,0 +1,133 @@
+"""Persistent store of experiment results.
+
+Campaigns are rerun after changing a single axis, recomputing every
+experiment that did not change. ResultStore keeps the results of each
+experiment in a directory, one pickle per key, and run.py serves them from
+there instead of simulating again. The simulation time is stored along, so
+the runtimes the scheduler estimates costs from (see schedule.py) are known for
+stored experiments as well.
+
+The key of an experiment is a SHA-256 over
+ * its Tree in canonical form (sorted keys, exact float reprs) without desc
+ * the content digests of its input files (any reqs_file, contents_file or
+   ttl_file), so regenerated traces are simulated again
+ * the data collectors and the replication number
+ * the version of the simulator code (code_version()): the sources of sim/,
+   trace/ and the installed icarus package, so results of changed policies,
+   strategies or workloads are not served
+"""
+import functools
+import hashlib
+import json
+import os
+import pickle
+
+import icarus
+
+import paths
+
+# experiment leaves naming input files, hashed by content
+INPUT_FILES = ('reqs_file', 'contents_file', 'ttl_file')
+
+# experiment keys not affecting the results
+IGNORED = ('desc',)
+
+
+@functools.lru_cache(maxsize=None)
+def _digest(path, mtime, size):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_digest(path):
+    """SHA-256 of a file's content, computed once per file version"""
+    st = os.stat(path)
+    return _digest(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+def input_digests(tree, prefix=''):
+    """Map the path of every input file leaf of tree to its file's digest"""
+    digests = {}
+    for k, v in tree.items():
+        path = f'{prefix}{k}'
+        if isinstance(v, dict):
+            digests.update(input_digests(v, path + '.'))
+        elif k in INPUT_FILES and isinstance(v, str):
+            digests[path] = file_digest(v) if os.path.exists(v) else None
+    return digests
+
+
+def _sources(path):
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+        for name in sorted(files):
+            if name.endswith('.py'):
+                yield os.path.join(root, name)
+
+
+@functools.lru_cache(maxsize=None)
+def code_version():
+    """SHA-256 over the Python sources of sim/, trace/ and icarus, and the
+    icarus version, computed once per process
+    """
+    h = hashlib.sha256(str(getattr(icarus, '__version__', None)).encode())
+    for path in (paths.SIM_DIR, paths.TRACE_DIR, os.path.dirname(os.path.abspath(icarus.__file__))):
+        for source in _sources(path):
+            h.update(os.path.relpath(source, path).encode())
+            h.update(file_digest(source).encode())
+    return h.hexdigest()
+
+
+def experiment_key(experiment, collectors=(), replication=0, code=None):
+    """Canonical hash of an experiment and its inputs, and of the code
+    version if given
+    """
+    tree = {k: v for k, v in experiment.items() if k not in IGNORED}
+    canonical = json.dumps({
+        'experiment': tree,
+        'inputs': input_digests(tree),
+        'collectors': sorted(collectors),
+        'replication': replication,
+        'code': code,
+    }, sort_keys=True, default=repr)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResultStore(object):
+    """Directory of experiment results keyed by experiment_key()"""
+
+    def __init__(self, path, collectors=()):
+        self.path = path
+        self.collectors = list(collectors)
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, experiment, replication):
+        key = experiment_key(experiment, self.collectors, replication, code_version())
+        return os.path.join(self.path, key + '.pickle')
+
+    def load(self, experiment, replication=0):
+        """Return the stored (results, duration) of an experiment, None if
+        not stored. duration is the simulation time in seconds, None if
+        unknown.
+        """
+        try:
+            with open(self._file(experiment, replication), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def get(self, experiment, replication=0):
+        """Return the stored results of an experiment, None if not stored"""
+        entry = self.load(experiment, replication)
+        return entry[0] if entry is not None else None
+
+    def put(self, experiment, results, replication=0, duration=None):
+        path = self._file(experiment, replication)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump((results, duration), f, protocol=pickle.HIGHEST_PROTOCOL)
+        # readers never see a partial file
+        os.replace(tmp, path)
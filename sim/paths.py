@@ -0,0 +1,16 @@
+"""Import paths of the simulator.
+
+The modules of sim/ import each other as top-level modules, which works
+whenever sim/ is on sys.path: for sim/run.py, which runs from there, and for
+plotresults.py, which the Makefiles call with PYTHONPATH=../sim. Importing
+this module also puts trace/ on sys.path, so the trace tools (tracestore,
+interning, writetimes, ...) can be imported the same way.
+"""
+import os
+import sys
+
+SIM_DIR = os.path.dirname(os.path.abspath(__file__))
+TRACE_DIR = os.path.join(os.path.dirname(SIM_DIR), 'trace')
+
+if TRACE_DIR not in sys.path:
+    sys.path.append(TRACE_DIR)
@@ -0,0 +1,803 @@
+"""Cache replacement policies for the DS2OS experiments.
+
+Importing this module registers the policies below with Icarus, replacing
+any policy of the same name. sim/run.py imports it, so every config run
+through the Makefiles can use them by name in cache_policy.
+
+ * MIN:               Belady's offline optimum, driven by the replayed
+                      workload's next uses
+ * IN_CACHE_LFU,
+   PERFECT_LFU,
+   DS2OS_PERFECT_LFU: O(1) LFU on frequency buckets, ties broken by recency
+ * MDMR:              most data most recent, replacing old data of the same
+                      producer, location or type
+ * LFF:               least fresh first, by the expected expiry of each
+                      version from its write times
+"""
+import bisect
+import collections
+import functools
+import heapq
+import itertools
+from array import array
+
+import numpy as np
+
+from icarus.models.cache import Cache
+from icarus.registry import register_cache_policy
+from icarus.util import inheritdoc
+
+import paths
+import ds2os
+import interning
+import replay
+import tracestore
+
+
+@register_cache_policy('MIN')
+class MinCache(Cache):
+    """Belady's MIN: evict the content whose next request lies farthest in
+    the future.
+
+    Next uses come from the replayed workload (see replay.py), which computes
+    them once per experiment. Cached contents sit in a max-heap by next use
+    with lazy deletion of outdated entries, so an eviction costs O(log k).
+
+    The incoming content competes with the cached ones: if it is requested
+    again later than everything in the cache, it is not admitted and put()
+    returns it as the evicted content. Without this, a capacity-1 cache would
+    replace its content on every miss.
+    """
+
+    @inheritdoc(Cache)
+    def __init__(self, maxlen, **kwargs):
+        self._maxlen = int(maxlen)
+        if self._maxlen <= 0:
+            raise ValueError('maxlen must be positive')
+        self._replay = replay.current()
+        self._replay.require_future()
+        # content -> position of its next request
+        self._next = {}
+        self._heap = []
+
+    @inheritdoc(Cache)
+    def __len__(self):
+        return len(self._next)
+
+    @property
+    @inheritdoc(Cache)
+    def maxlen(self):
+        return self._maxlen
+
+    def _next_request(self, k):
+        if k == self._replay.content:
+            return self._replay.next_request()
+        # not the content being requested: keep what is known about it
+        return self._next.get(k, len(self._replay.next_use))
+
+    def _push(self, k, nxt):
+        self._next[k] = nxt
+        heapq.heappush(self._heap, (-nxt, k))
+        if len(self._heap) > 2 * len(self._next) + 32:
+            self._heap = [(-n, c) for c, n in self._next.items()]
+            heapq.heapify(self._heap)
+
+    @inheritdoc(Cache)
+    def dump(self):
+        return sorted(self._next, key=self._next.get)
+
+    @inheritdoc(Cache)
+    def position(self, k):
+        if k not in self._next:
+            raise ValueError('The item %s is not in the cache' % str(k))
+        return self.dump().index(k)
+
+    @inheritdoc(Cache)
+    def has(self, k):
+        return k in self._next
+
+    @inheritdoc(Cache)
+    def get(self, k):
+        if k not in self._next:
+            return False
+        self._push(k, self._next_request(k))
+        return True
+
+    def put(self, k):
+        """Insert an item in the cache if not already inserted.
+
+        If the element is already present in the cache, its next use is
+        updated. Otherwise the content requested farthest in the future,
+        possibly k itself, is evicted once the cache is over capacity.
+
+        Parameters
+        ----------
+        k : any hashable type
+            The item to be inserted
+
+        Returns
+        -------
+        evicted : any hashable type
+            The evicted object or *None* if no contents were evicted.
+        """
+        self._push(k, self._next_request(k))
+        if len(self._next) <= self._maxlen:
+            return None
+        while True:
+            nxt, victim = heapq.heappop(self._heap)
+            if self._next.get(victim) == -nxt:
+                del self._next[victim]
+                return victim
+
+    @inheritdoc(Cache)
+    def remove(self, k):
+        if k not in self._next:
+            return False
+        del self._next[k]
+        return True
+
+    @inheritdoc(Cache)
+    def clear(self):
+        self._next.clear()
+        self._heap = []
+
+
+class _Bucket(object):
+    """Contents of one frequency, least recently entered first"""
+
+    __slots__ = ('freq', 'items', 'prev', 'next')
+
+    def __init__(self, freq, prev=None, next=None):
+        self.freq = freq
+        self.items = collections.OrderedDict()
+        self.prev = prev
+        self.next = next
+
+
+class FrequencyBuckets(object):
+    """LFU order: a doubly linked list of frequency buckets, ascending, each
+    holding its contents in the order they reached it.
+
+    Incrementing a content moves it to the next bucket (created after the
+    current one if needed), so it becomes the most recent content of its new
+    frequency. The victim is the least recent content of the lowest bucket,
+    i.e. ties in frequency are broken by recency.
+
+    Buckets are also indexed by frequency, so inserting at a frequency that
+    has a bucket is O(1). A new frequency is linked after the nearest lower
+    bucket, found by bisecting the sorted frequencies (at most one per cached
+    content) instead of walking the list.
+    """
+
+    def __init__(self):
+        self._head = None
+        self._bucket = {}
+        # frequency -> bucket, and the frequencies in ascending order
+        self._buckets = {}
+        self._freqs = []
+
+    def __len__(self):
+        return len(self._bucket)
+
+    def __contains__(self, k):
+        return k in self._bucket
+
+    def _link(self, freq, prev):
+        nxt = prev.next if prev is not None else self._head
+        b = _Bucket(freq, prev, nxt)
+        if prev is None:
+            self._head = b
+        else:
+            prev.next = b
+        if nxt is not None:
+            nxt.prev = b
+        self._buckets[freq] = b
+        bisect.insort(self._freqs, freq)
+        return b
+
+    def _unlink_if_empty(self, b):
+        if b.items:
+            return
+        if b.prev is None:
+            self._head = b.next
+        else:
+            b.prev.next = b.next
+        if b.next is not None:
+            b.next.prev = b.prev
+        del self._buckets[b.freq]
+        del self._freqs[bisect.bisect_left(self._freqs, b.freq)]
+
+    def insert(self, k, freq=1):
+        b = self._buckets.get(freq)
+        if b is None:
+            i = bisect.bisect_left(self._freqs, freq)
+            b = self._link(freq, self._buckets[self._freqs[i - 1]] if i else None)
+        b.items[k] = None
+        self._bucket[k] = b
+
+    def increment(self, k):
+        b = self._bucket[k]
+        nb = b.next
+        if nb is None or nb.freq != b.freq + 1:
+            nb = self._link(b.freq + 1, b)
+        del b.items[k]
+        nb.items[k] = None
+        self._bucket[k] = nb
+        self._unlink_if_empty(b)
+
+    def frequency(self, k):
+        return self._bucket[k].freq
+
+    def peek(self):
+        """Return the least frequent, least recent content"""
+        return next(iter(self._head.items))
+
+    def pop(self):
+        """Remove and return the least frequent, least recent content"""
+        b = self._head
+        k = b.items.popitem(last=False)[0]
+        del self._bucket[k]
+        self._unlink_if_empty(b)
+        return k
+
+    def remove(self, k):
+        b = self._bucket.pop(k)
+        del b.items[k]
+        self._unlink_if_empty(b)
+
+    def order(self):
+        """Contents from most to least frequent, most recent first on ties"""
+        res = []
+        b = self._head
+        while b is not None:
+            res.extend(b.items)
+            b = b.next
+        res.reverse()
+        return res
+
+    def clear(self):
+        self._head = None
+        self._bucket.clear()
+        self._buckets.clear()
+        self._freqs = []
+
+
+class Counts(object):
+    """Request counts by content, kept in an int array for interned content
+    IDs and in a dict for any other key
+    """
+
+    def __init__(self):
+        self._ids = array('i')
+        self._other = {}
+
+    def __getitem__(self, k):
+        if type(k) is int:
+            return self._ids[k] if k < len(self._ids) else 0
+        return self._other.get(k, 0)
+
+    def increment(self, k):
+        if type(k) is int:
+            ids = self._ids
+            if k >= len(ids):
+                ids.frombytes(bytes(ids.itemsize * (max(k + 1, 2 * len(ids)) - len(ids))))
+            ids[k] += 1
+            return ids[k]
+        c = self._other[k] = self._other.get(k, 0) + 1
+        return c
+
+
+class _LfuCache(Cache):
+
+    @inheritdoc(Cache)
+    def __init__(self, maxlen, **kwargs):
+        self._maxlen = int(maxlen)
+        if self._maxlen <= 0:
+            raise ValueError('maxlen must be positive')
+        self._lfu = FrequencyBuckets()
+
+    @inheritdoc(Cache)
+    def __len__(self):
+        return len(self._lfu)
+
+    @property
+    @inheritdoc(Cache)
+    def maxlen(self):
+        return self._maxlen
+
+    @inheritdoc(Cache)
+    def dump(self):
+        return self._lfu.order()
+
+    @inheritdoc(Cache)
+    def position(self, k):
+        if k not in self._lfu:
+            raise ValueError('The item %s is not in the cache' % str(k))
+        return self.dump().index(k)
+
+    @inheritdoc(Cache)
+    def has(self, k):
+        return k in self._lfu
+
+    def _insert(self, k, freq):
+        self._lfu.insert(k, freq)
+        if len(self._lfu) > self._maxlen:
+            return self._evict()
+        return None
+
+    def _evict(self):
+        return self._lfu.pop()
+
+    @inheritdoc(Cache)
+    def remove(self, k):
+        if k not in self._lfu:
+            return False
+        self._lfu.remove(k)
+        return True
+
+    @inheritdoc(Cache)
+    def clear(self):
+        self._lfu.clear()
+
+
+@register_cache_policy('IN_CACHE_LFU')
+class InCacheLfuCache(_LfuCache):
+    """In-cache Least Frequently Used (LFU) cache.
+
+    Frequencies count the hits of a content since it was inserted. A new
+    content enters with frequency 1 and is itself evicted if every other
+    content has been hit, ties are broken by recency. All operations are O(1).
+    """
+
+    @inheritdoc(Cache)
+    def get(self, k):
+        if k not in self._lfu:
+            return False
+        self._lfu.increment(k)
+        return True
+
+    @inheritdoc(Cache)
+    def put(self, k):
+        if k in self._lfu:
+            return None
+        return self._insert(k, 1)
+
+
+@register_cache_policy('PERFECT_LFU')
+class PerfectLfuCache(_LfuCache):
+    """Perfect Least Frequently Used (LFU) cache.
+
+    Frequencies count every request seen by the cache, hit or miss, and are
+    kept for contents that are not cached. The counts live in a compact int
+    array indexed by content ID (see ds2os.install()), cached contents in
+    frequency buckets, so lookups, hits and evictions are O(1) and inserting
+    a content with a frequency no cached content has bisects the sorted
+    frequencies.
+    """
+
+    @inheritdoc(Cache)
+    def __init__(self, maxlen, **kwargs):
+        super().__init__(maxlen, **kwargs)
+        self._counts = Counts()
+
+    def _key(self, k):
+        return k
+
+    @inheritdoc(Cache)
+    def get(self, k):
+        self._counts.increment(self._key(k))
+        if k not in self._lfu:
+            return False
+        self._lfu.increment(k)
+        return True
+
+    @inheritdoc(Cache)
+    def put(self, k):
+        if k in self._lfu:
+            return None
+        return self._insert(k, max(self._counts[self._key(k)], 1))
+
+
+@register_cache_policy('DS2OS_PERFECT_LFU')
+class Ds2osPerfectLfuCache(PerfectLfuCache):
+    """Perfect LFU counting requests by address rather than by content, so
+    all versions of a sensor value share the popularity of the sensor.
+
+    The frequency buckets hold addresses, each with its cached versions in
+    insertion order. A request for any version raises its address by one
+    bucket, O(1) however many versions are cached. The victim is the oldest
+    version of the least frequent, least recent address.
+    """
+
+    @inheritdoc(Cache)
+    def __init__(self, maxlen, **kwargs):
+        super().__init__(maxlen, **kwargs)
+        # address -> cached contents, oldest first
+        self._versions = {}
+        self._n = 0
+
+    def _key(self, k):
+        return ds2os.content_address(k)
+
+    @inheritdoc(Cache)
+    def __len__(self):
+        return self._n
+
+    @inheritdoc(Cache)
+    def dump(self):
+        return [k for a in self._lfu.order() for k in reversed(self._versions[a])]
+
+    @inheritdoc(Cache)
+    def position(self, k):
+        if not self.has(k):
+            raise ValueError('The item %s is not in the cache' % str(k))
+        return self.dump().index(k)
+
+    @inheritdoc(Cache)
+    def has(self, k):
+        return k in self._versions.get(self._key(k), ())
+
+    @inheritdoc(Cache)
+    def get(self, k):
+        a = self._key(k)
+        self._counts.increment(a)
+        if a not in self._lfu:
+            return False
+        self._lfu.increment(a)
+        return k in self._versions[a]
+
+    @inheritdoc(Cache)
+    def put(self, k):
+        a = self._key(k)
+        versions = self._versions.get(a)
+        if versions is None:
+            versions = self._versions[a] = collections.OrderedDict()
+            self._lfu.insert(a, max(self._counts[a], 1))
+        elif k in versions:
+            return None
+        else:
+            # a new version makes its address the most recent of its bucket
+            freq = self._lfu.frequency(a)
+            self._lfu.remove(a)
+            self._lfu.insert(a, freq)
+        versions[k] = None
+        self._n += 1
+        if self._n > self._maxlen:
+            return self._evict()
+        return None
+
+    def _evict(self):
+        a = self._lfu.peek()
+        versions = self._versions[a]
+        k = versions.popitem(last=False)[0]
+        self._n -= 1
+        if not versions:
+            del self._versions[a]
+            self._lfu.remove(a)
+        return k
+
+    @inheritdoc(Cache)
+    def remove(self, k):
+        a = self._key(k)
+        versions = self._versions.get(a)
+        if versions is None or k not in versions:
+            return False
+        del versions[k]
+        self._n -= 1
+        if not versions:
+            del self._versions[a]
+            self._lfu.remove(a)
+        return True
+
+    @inheritdoc(Cache)
+    def clear(self):
+        super().clear()
+        self._versions.clear()
+        self._n = 0
+
+
+# MDMR grouping -> trace column the group is read from, None if it follows
+# from the address itself
+MDMR_GROUPS = {
+    'producer': None,
+    'location': 'destinationLocation',
+    'type':     'accessedNodeType',
+}
+
+
+@functools.lru_cache(maxsize=None)
+def trace_groups(reqs_file, column):
+    """Map the address ID of every address in a trace to the label of column
+    in its first request
+    """
+    trace = tracestore.open_trace(reqs_file)
+    table = ds2os.content_table()
+    addresses = trace.labels('accessedNodeAddress')
+    labels = trace.labels(column)
+    codes, rows = np.unique(np.asarray(trace['accessedNodeAddress']), return_index=True)
+    values = np.asarray(trace[column])[rows]
+    return {table.intern_address(addresses[a]): labels[v] for a, v in zip(codes.tolist(), values.tolist())}
+
+
+def producer(address):
+    """The service offering an address, e.g. /agent4/movement4 for
+    /agent4/movement4/lastChange
+    """
+    return '/'.join(address.split('/')[:3])
+
+
+@register_cache_policy('MDMR')
+class MdmrCache(Cache):
+    """Most Data Most Recent (MDMR) cache.
+
+    A new content replaces the least recently used cached content of its own
+    group, if there is one, so each group keeps its most recent data.
+    Otherwise it is inserted as in LRU, evicting the least recently used
+    content if the cache is full. Hits move a content to the top.
+
+    Cached contents are indexed by group, so the same-group victim is found
+    in O(1) without scanning the cache. The group is chosen with the `group`
+    argument of cache_policy:
+
+     * producer: the service offering the address (default)
+     * location: the location of that service (destinationLocation)
+     * type:     the accessed node type (accessedNodeType)
+
+    Location and type are read from the workload's reqs_file.
+    """
+
+    @inheritdoc(Cache)
+    def __init__(self, maxlen, group='producer', **kwargs):
+        self._maxlen = int(maxlen)
+        if self._maxlen <= 0:
+            raise ValueError('maxlen must be positive')
+        if group not in MDMR_GROUPS:
+            raise ValueError(f'group must be one of {", ".join(MDMR_GROUPS)}')
+        self._table = ds2os.content_table()
+        column = MDMR_GROUPS[group]
+        if column is None:
+            self._labels = None
+        else:
+            reqs_file = replay.current().spec.get('reqs_file')
+            if reqs_file is None:
+                raise ValueError(f'MDMR by {group} needs a trace-driven workload with a reqs_file')
+            self._labels = trace_groups(reqs_file, column)
+        self._groups = {}
+        # content -> group, least recently used first
+        self._cache = collections.OrderedDict()
+        # group -> its cached contents, least recently used first
+        self._members = {}
+
+    def _group(self, k):
+        a = ds2os.content_address(k)
+        g = self._groups.get(a)
+        if g is None:
+            address = self._table.addresses[a]
+            g = producer(address) if self._labels is None else self._labels.get(a, address)
+            self._groups[a] = g
+        return g
+
+    def _discard(self, k):
+        g = self._cache.pop(k)
+        members = self._members[g]
+        del members[k]
+        if not members:
+            del self._members[g]
+
+    def _touch(self, k):
+        self._cache.move_to_end(k)
+        self._members[self._cache[k]].move_to_end(k)
+
+    @inheritdoc(Cache)
+    def __len__(self):
+        return len(self._cache)
+
+    @property
+    @inheritdoc(Cache)
+    def maxlen(self):
+        return self._maxlen
+
+    @inheritdoc(Cache)
+    def dump(self):
+        return list(reversed(self._cache))
+
+    @inheritdoc(Cache)
+    def position(self, k):
+        if k not in self._cache:
+            raise ValueError('The item %s is not in the cache' % str(k))
+        return self.dump().index(k)
+
+    @inheritdoc(Cache)
+    def has(self, k):
+        return k in self._cache
+
+    @inheritdoc(Cache)
+    def get(self, k):
+        if k not in self._cache:
+            return False
+        self._touch(k)
+        return True
+
+    @inheritdoc(Cache)
+    def put(self, k):
+        if k in self._cache:
+            self._touch(k)
+            return None
+        g = self._group(k)
+        members = self._members.get(g)
+        if members:
+            evicted = next(iter(members))
+            self._discard(evicted)
+        elif len(self._cache) >= self._maxlen:
+            evicted = next(iter(self._cache))
+            self._discard(evicted)
+        else:
+            evicted = None
+        self._cache[k] = g
+        self._members.setdefault(g, collections.OrderedDict())[k] = None
+        return evicted
+
+    @inheritdoc(Cache)
+    def remove(self, k):
+        if k not in self._cache:
+            return False
+        self._discard(k)
+        return True
+
+    @inheritdoc(Cache)
+    def clear(self):
+        self._cache.clear()
+        self._members.clear()
+
+
+class WriteTimes(object):
+    """lastWrite and nextWrite of every content, parsed once from its
+    address/lastWrite/nextWrite name (see contentsWriteTimes.txt) and looked
+    up by content ID or name afterwards
+    """
+
+    def __init__(self):
+        self._table = ds2os.content_table()
+        self._times = {}
+
+    def __getitem__(self, k):
+        times = self._times.get(k)
+        if times is None:
+            version = self._table.version(k) if type(k) is int else interning.split_content(k)[1]
+            last, _, nxt = version.partition('/')
+            if not nxt:
+                raise ValueError(f'content {k} carries no write times, use the contentsWriteTimes.txt catalogue')
+            times = self._times[k] = (float(last), float(nxt))
+        return times
+
+
+@functools.lru_cache(maxsize=1)
+def write_times():
+    """Return the process-wide WriteTimes table"""
+    return WriteTimes()
+
+
+LFF_LIFETIMES = ('next', 'mean')
+
+
+@register_cache_policy('LFF')
+class LffCache(Cache):
+    """Least Fresh First (LFF) cache.
+
+    Evicts the content expected to be overwritten first, i.e. with the
+    shortest expected remaining lifetime. Since all contents age at the same
+    rate, that is the one with the earliest expected expiry, which the
+    `lifetime` argument of cache_policy estimates as:
+
+     * next: its nextWrite, known from the trace (default)
+     * mean: its lastWrite plus the mean interval between the versions of its
+             address seen so far by this cache, which uses no future
+             knowledge and improves as versions come by
+
+    Cached contents sit in a min-heap by expiry. Entries are updated lazily:
+    a hit pushes a new entry only if the estimate changed, outdated entries
+    are skipped when they surface, so an eviction is O(log k). Like the
+    other policies here, an incoming content may itself be the least fresh
+    and is then not admitted.
+    """
+
+    @inheritdoc(Cache)
+    def __init__(self, maxlen, lifetime='next', **kwargs):
+        self._maxlen = int(maxlen)
+        if self._maxlen <= 0:
+            raise ValueError('maxlen must be positive')
+        if lifetime not in LFF_LIFETIMES:
+            raise ValueError(f'lifetime must be one of {", ".join(LFF_LIFETIMES)}')
+        self._mean = lifetime == 'mean'
+        self._times = write_times()
+        self._expiry = {}
+        self._heap = []
+        self._seq = itertools.count()
+        # address -> [latest lastWrite, sum of intervals, number of intervals]
+        self._intervals = {}
+        self._total = [0.0, 0]
+
+    def _estimate(self, k):
+        last, nxt = self._times[k]
+        if not self._mean:
+            return nxt
+        a = ds2os.content_address(k)
+        seen = self._intervals.get(a)
+        if seen is None:
+            self._intervals[a] = [last, 0.0, 0]
+        elif last > seen[0]:
+            seen[1] += last - seen[0]
+            seen[2] += 1
+            self._total[0] += last - seen[0]
+            self._total[1] += 1
+            seen[0] = last
+        if seen is not None and seen[2]:
+            return last + seen[1] / seen[2]
+        if self._total[1]:
+            return last + self._total[0] / self._total[1]
+        return last
+
+    def _push(self, k, expiry):
+        self._expiry[k] = expiry
+        heapq.heappush(self._heap, (expiry, next(self._seq), k))
+        if len(self._heap) > 2 * len(self._expiry) + 32:
+            self._heap = [(e, next(self._seq), c) for c, e in self._expiry.items()]
+            heapq.heapify(self._heap)
+
+    @inheritdoc(Cache)
+    def __len__(self):
+        return len(self._expiry)
+
+    @property
+    @inheritdoc(Cache)
+    def maxlen(self):
+        return self._maxlen
+
+    @inheritdoc(Cache)
+    def dump(self):
+        return sorted(self._expiry, key=self._expiry.get, reverse=True)
+
+    @inheritdoc(Cache)
+    def position(self, k):
+        if k not in self._expiry:
+            raise ValueError('The item %s is not in the cache' % str(k))
+        return self.dump().index(k)
+
+    @inheritdoc(Cache)
+    def has(self, k):
+        return k in self._expiry
+
+    @inheritdoc(Cache)
+    def get(self, k):
+        if k not in self._expiry:
+            return False
+        if self._mean:
+            expiry = self._estimate(k)
+            if expiry != self._expiry[k]:
+                self._push(k, expiry)
+        return True
+
+    @inheritdoc(Cache)
+    def put(self, k):
+        if k in self._expiry:
+            return None
+        self._push(k, self._estimate(k))
+        if len(self._expiry) <= self._maxlen:
+            return None
+        while True:
+            expiry, _, victim = heapq.heappop(self._heap)
+            if self._expiry.get(victim) == expiry:
+                del self._expiry[victim]
+                return victim
+
+    @inheritdoc(Cache)
+    def remove(self, k):
+        if k not in self._expiry:
+            return False
+        del self._expiry[k]
+        return True
+
+    @inheritdoc(Cache)
+    def clear(self):
+        self._expiry.clear()
+        self._heap = []
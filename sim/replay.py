@@ -0,0 +1,85 @@
+"""Replay state shared between the workload and the cache policies.
+
+Icarus cache policies only see get/put calls, without the time or position
+of the request being served. install() wraps every registered workload so
+that, while it is replayed, the workload publishes:
+
+ * index:    position of the current request in the workload
+ * time:     simulated time of the current request
+ * next_use: for offline policies, the position of the next request for the
+             same content at every position (len(workload) if none)
+
+Policies pick up the replay of the experiment under construction with
+current(), since run_scenario builds the workload right before the caches.
+next_use costs one extra pass over the workload and is only computed when a
+policy asks for it with require_future() at construction time. Components
+that must act between requests (e.g. replaying the trace's writes) register
+a hook, called with (index, time, event) before each event is served.
+"""
+from icarus.registry import WORKLOAD
+
+import paths
+import writetimes
+
+_current = None
+
+
+def current():
+    """Return the replay of the experiment being set up"""
+    if _current is None:
+        raise ValueError('no replayed workload, run the campaign with sim/run.py')
+    return _current
+
+
+class ReplayWorkload(object):
+
+    def __init__(self, workload, spec=None):
+        global _current
+        self.workload = workload
+        self.spec = spec or {}
+        self.hooks = []
+        self.index = -1
+        self.time = 0.0
+        self.content = None
+        self.next_use = None
+        self.future = False
+        _current = self
+
+    def __getattr__(self, name):
+        if name == 'workload':
+            raise AttributeError(name)
+        return getattr(self.workload, name)
+
+    def require_future(self):
+        self.future = True
+
+    def next_request(self):
+        """Position of the next request for the current content"""
+        return int(self.next_use[self.index])
+
+    def __iter__(self):
+        events = self.workload
+        if self.future:
+            events = list(self.workload)
+            self.next_use = writetimes.next_use([event['content'] for _, event in events])
+        for i, (t, event) in enumerate(events):
+            self.index = i
+            self.time = t
+            self.content = event['content']
+            for hook in self.hooks:
+                hook(i, t, event)
+            yield t, event
+
+
+def replayed_workload(workload_cls):
+    def workload(topology, **kwargs):
+        return ReplayWorkload(workload_cls(topology, **kwargs), kwargs)
+    workload.replayed = True
+    return workload
+
+
+def install():
+    """Wrap every registered workload, calling it more than once is harmless"""
+    for name in list(WORKLOAD):
+        if not getattr(WORKLOAD[name], 'replayed', False):
+            WORKLOAD[name] = replayed_workload(WORKLOAD[name])
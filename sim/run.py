@@ -0,0 +1,278 @@
+"""Run an Icarus campaign with the extensions in this directory.
+
+Drop-in replacement for `icarus run`, used by the experiment Makefiles:
+
+    python ../sim/run.py --results results.pickle config.py
+
+The experiment queue is first planned into jobs. Plain experiments run
+through icarus.orchestration.run_scenario as usual, while groups that can be
+simulated together run as one job:
+
+ * sweep:     LRU/LCE experiments differing only in network_cache share one
+              stack-distance pass (see stackdist.py), disable with --no-sweep
+ * lockstep:  experiments differing only in cache_policy share one workload
+              pass and routing (see lockstep.py), disable with --no-lockstep
+
+Workloads are wrapped by replay.install() so that cache policies can follow
+the replay (see replay.py), and the policies and collectors of policies.py,
+arraycache.py, versions.py, ttl.py and admission.py are registered.
+With the spawn start method the config file is executed again in every
+worker process, so registry changes it makes (e.g. ds2os.install()) apply to
+the workers as well. EXPERIMENT_QUEUE may be any iterable of experiments,
+e.g. a lazily built Sweep (see sweep.py).
+
+Results are kept in a store beside the results file (memo/, see memo.py)
+and experiments found there are not simulated again, so extending a sweep
+only runs the new points. Change the store with --memo, disable it with
+--no-memo.
+
+Experiments that provably produce the same results (e.g. the NULL policy at
+every cache size, see equivalence.py) are simulated once, the others of
+their class get a copy of the results. Only the simulated experiment goes to
+the store and the journal, and a class is served from them by any of its
+members. Disable with --no-prune.
+
+With PARALLEL_EXECUTION, jobs are dispatched longest first by estimated
+cost (see schedule.py), refined with the runtimes measured in earlier runs
+(runtimes.json beside the results file, change with --runtimes).
+
+Every finished experiment is appended to a journal beside the results file
+(see journal.py). After a crash, --resume reloads it and runs only the
+experiments missing from it. A worker exception stops the campaign, and if
+any experiment produced no results the run fails once the others are done.
+"""
+import argparse
+import collections
+import logging
+import multiprocessing as mp
+import os
+import time
+
+from icarus.orchestration import run_scenario
+from icarus.registry import RESULTS_WRITER
+from icarus.results import ResultSet
+from icarus.util import Settings, config_logging, timestr
+
+import admission
+import arraycache
+import equivalence
+import journal
+import lockstep
+import memo
+import policies
+import replay
+import schedule
+import stackdist
+import ttl
+import versions
+
+logger = logging.getLogger('main')
+
+# experiment paths (and path prefixes) that may differ inside a job's group
+SWEEP_AXES = {('cache_placement', 'network_cache'), ('desc',)}
+LOCKSTEP_AXES = {('cache_policy',), ('desc',)}
+
+
+def flatten(tree, prefix=()):
+    """Map every leaf path of a (nested dict) experiment to its value"""
+    paths = {}
+    for k, v in tree.items():
+        if isinstance(v, dict):
+            paths.update(flatten(v, prefix + (k,)))
+        else:
+            paths[prefix + (k,)] = v
+    return paths
+
+
+def group_key(experiment, ignore):
+    """Canonical representation of an experiment without the ignored paths"""
+    return tuple(sorted((path, repr(v)) for path, v in flatten(experiment).items()
+                        if not any(path[:len(p)] == p for p in ignore)))
+
+
+def plan(settings, sweep=True, lockstep=True, experiments=None):
+    """Split the experiments (default: the experiment queue) into jobs, a
+    list of (kind, experiments)
+    """
+    jobs = []
+    groups = collections.OrderedDict()
+    if experiments is None:
+        experiments = settings.EXPERIMENT_QUEUE
+
+    def add(experiment):
+        if lockstep:
+            groups.setdefault(('lockstep', group_key(experiment, LOCKSTEP_AXES)), []).append(experiment)
+        else:
+            jobs.append(('single', [experiment]))
+
+    for experiment in experiments:
+        if sweep and stackdist.is_sweep_candidate(experiment, settings):
+            groups.setdefault(('sweep', group_key(experiment, SWEEP_AXES)), []).append(experiment)
+        else:
+            add(experiment)
+    # sweeps that would not be exact on their topology are planned like the
+    # other experiments
+    for key, experiments in list(groups.items()):
+        if key[0] == 'sweep' and len(experiments) > 1 and not stackdist.is_sweepable(experiments):
+            del groups[key]
+            for experiment in experiments:
+                add(experiment)
+    for (kind, _), experiments in groups.items():
+        jobs.append((kind if len(experiments) > 1 else 'single', experiments))
+    return jobs
+
+
+def execute(settings, job, curr_exp, n_exp):
+    """Run a job and return a list of (params, results, duration)"""
+    kind, experiments = job
+    if kind == 'sweep':
+        return stackdist.run_lru_sweep(settings, experiments, curr_exp, n_exp)
+    if kind == 'lockstep':
+        return lockstep.run_lockstep(settings, experiments, curr_exp, n_exp)
+    res = run_scenario(settings, experiments[0], curr_exp, n_exp)
+    return [res] if res is not None else []
+
+
+# settings of this process, kept by workers so jobs carry only their
+# experiments and not the whole EXPERIMENT_QUEUE (a Sweep may not pickle)
+_settings = None
+
+
+def _init_worker(config_file):
+    global _settings
+    # forked workers inherit the parent's registries and settings
+    if mp.get_start_method() != 'fork':
+        settings = Settings()
+        settings.read_from(config_file)
+        settings.freeze()
+        _settings = settings
+        replay.install()
+
+
+def _execute(task):
+    replication, job, curr_exp, n_exp = task
+    return replication, execute(_settings, job, curr_exp, n_exp)
+
+
+def run(settings, config_file, sweep=True, lockstep=True, store=None, prune=True, runtimes=None,
+        journal=None):
+    global _settings
+    _settings = settings
+    results = ResultSet()
+    # (replication, job)
+    jobs = []
+    n_stored = 0
+    n_resumed = 0
+    # (replication, equivalence key) -> experiments sharing the results of
+    # their class's representative
+    copies = {}
+    for replication in range(settings.N_REPLICATIONS):
+        queue = list(settings.EXPERIMENT_QUEUE)
+        members = equivalence.classes(queue) if prune else [[experiment] for experiment in queue]
+        experiments = []
+        for m in members:
+            # the results of any member serve its whole class
+            for experiment in m:
+                r = journal.get(experiment, replication) if journal is not None else None
+                if r is not None:
+                    n_resumed += len(m)
+                    break
+                entry = store.load(experiment, replication) if store is not None else None
+                if entry is not None:
+                    r, duration = entry
+                    n_stored += len(m)
+                    if runtimes is not None and duration is not None:
+                        runtimes.record(experiment, duration)
+                    break
+            else:
+                experiments.append(m[0])
+                if len(m) > 1:
+                    copies[replication, equivalence.equivalence_key(m[0])] = m[1:]
+                continue
+            for experiment in m:
+                results.add(experiment, r)
+        jobs.extend((replication, job) for job in plan(settings, sweep, lockstep, experiments))
+    n_exp = sum(len(job[1]) for _, job in jobs)
+    n_copies = sum(len(m) for m in copies.values())
+    logger.info('Planned %d experiments into %d jobs, %d results resumed from the journal, '
+                '%d taken from the store, %d copied from equivalent experiments',
+                n_exp, len(jobs), n_resumed, n_stored, n_copies)
+    n_done = [0]
+
+    def collect(replication, res):
+        for params, r, duration in res:
+            if runtimes is not None:
+                runtimes.record(params, duration)
+            # only the simulated experiment is kept, its class is expanded
+            # again from it when results are built
+            if store is not None:
+                store.put(params, r, replication, duration)
+            if journal is not None:
+                journal.put(params, r, replication)
+            equivalent = copies.get((replication, equivalence.equivalence_key(params)), []) if copies else []
+            for experiment in [params] + equivalent:
+                results.add(experiment, r)
+        n_done[0] += len(res)
+
+    start = time.time()
+    curr_exp = 1
+    if settings.PARALLEL_EXECUTION:
+        jobs = schedule.schedule(jobs, schedule.CostModel(runtimes), settings.N_PROCESSES)
+        tasks = []
+        for replication, job in jobs:
+            tasks.append((replication, job, curr_exp, n_exp))
+            curr_exp += len(job[1])
+        # results are collected here rather than in the pool's result thread,
+        # so a worker exception or a failing store write is raised in this
+        # process instead of being dropped
+        with mp.Pool(settings.N_PROCESSES, initializer=_init_worker, initargs=(config_file,)) as pool:
+            for replication, res in pool.imap_unordered(_execute, tasks):
+                collect(replication, res)
+    else:
+        for replication, job in jobs:
+            collect(replication, execute(settings, job, curr_exp, n_exp))
+            curr_exp += len(job[1])
+    logger.info('Completed %d of %d experiments in %s', n_done[0], n_exp, timestr(time.time() - start, True))
+    if runtimes is not None:
+        runtimes.save()
+    if n_done[0] < n_exp:
+        raise RuntimeError(f'{n_exp - n_done[0]} of {n_exp} experiments failed (see the log above), '
+                           'rerun with --resume to run only those')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run an Icarus campaign')
+    parser.add_argument('-r', '--results', required=True, help='the results file')
+    parser.add_argument('config', help='the configuration file')
+    parser.add_argument('--no-sweep', action='store_true', help='run LRU cache-size sweeps as separate experiments')
+    parser.add_argument('--no-lockstep', action='store_true', help='run cache policies as separate experiments')
+    parser.add_argument('--no-prune', action='store_true', help='simulate equivalent experiments separately')
+    parser.add_argument('--memo', help='the result store (default: memo/ beside the results file)')
+    parser.add_argument('--no-memo', action='store_true', help='simulate every experiment, without the result store')
+    parser.add_argument('--resume', action='store_true',
+                        help='keep the results journaled by an interrupted run and run only the missing experiments')
+    parser.add_argument('--runtimes', help='the measured runtimes (default: runtimes.json beside the results file)')
+    args = parser.parse_args()
+    config_file = os.path.abspath(args.config)
+    settings = Settings()
+    settings.read_from(config_file)
+    replay.install()
+    config_logging(settings.LOG_LEVEL)
+    settings.freeze()
+    results_dir = os.path.dirname(os.path.abspath(args.results))
+    store = None
+    if not args.no_memo:
+        store = memo.ResultStore(args.memo or os.path.join(results_dir, 'memo'), settings.DATA_COLLECTORS)
+    runtimes = schedule.Runtimes(args.runtimes or os.path.join(results_dir, 'runtimes.json'), settings.DATA_COLLECTORS)
+    campaign_journal = journal.Journal(os.path.abspath(args.results) + '.journal', settings.DATA_COLLECTORS,
+                                       resume=args.resume)
+    results = run(settings, config_file, sweep=not args.no_sweep, lockstep=not args.no_lockstep,
+                  store=store, prune=not args.no_prune, runtimes=runtimes, journal=campaign_journal)
+    RESULTS_WRITER[settings.RESULTS_FORMAT](results, args.results)
+    logger.info('Saved results to file %s', os.path.abspath(args.results))
+    campaign_journal.remove()
+
+
+if __name__ == '__main__':
+    main()
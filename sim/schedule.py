@@ -0,0 +1,175 @@
+"""Longest-job-first scheduling of parallel campaigns.
+
+Jobs used to be handed to the worker pool in queue order, so a long run
+(large caches, high alpha) starting last kept one core busy while the others
+idled. schedule() orders the jobs by estimated cost, longest first. The pool
+hands out one job at a time from its shared queue, so whichever worker is
+free takes the longest job left.
+
+The cost of an experiment is the median runtime recorded for its cache
+policy and cache size (network_cache) in earlier runs (Runtimes, a JSON file
+beside the results, also filled from the durations kept in the result
+store). Without such a record it is the longest estimate recorded, so
+unknown experiments start early. Before anything is recorded, experiments
+are compared by
+
+    requests x mean path length x policy cost factor
+
+A lockstep job costs the sum of its experiments. A sweep job, checked to be
+exact when planned (see stackdist.is_sweepable), costs its most expensive
+one. Lockstep jobs that alone exceed a worker's share of the total are
+split, so no single job sets the makespan.
+"""
+import collections
+import functools
+import json
+import math
+import os
+import statistics
+
+import networkx as nx
+
+from icarus.registry import TOPOLOGY_FACTORY
+
+import memo
+
+# relative cost of a cache operation, 1 for policies not listed
+POLICY_COST = {
+    'NULL': 0.5,
+    'MIN': 2.0,
+    'PERFECT_LFU': 1.5,
+    'DS2OS_PERFECT_LFU': 1.5,
+    'MDMR': 1.5,
+    'LFF': 1.5,
+    'SLRU': 1.2,
+    'TTL': 1.3,
+    'VERSIONED': 1.3,
+    'TINY_LFU': 1.3,
+}
+
+
+def cost_key(experiment):
+    """The (cache policy, network_cache) runtimes are estimated by"""
+    return (experiment.get('cache_policy', {}).get('name'),
+            experiment.get('cache_placement', {}).get('network_cache'))
+
+
+class Runtimes(object):
+    """Measured experiment runtimes, kept in a JSON file between runs
+    together with the cost key of their experiment
+    """
+
+    def __init__(self, path, collectors=()):
+        self.path = path
+        self.collectors = list(collectors)
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def key(self, experiment):
+        return memo.experiment_key(experiment, self.collectors)
+
+    def record(self, experiment, duration):
+        policy, network_cache = cost_key(experiment)
+        self.entries[self.key(experiment)] = {'seconds': duration, 'policy': policy,
+                                              'network_cache': network_cache}
+
+    def items(self):
+        """Iterate over the recorded (cost key, seconds)"""
+        for entry in self.entries.values():
+            # files of earlier versions lack the cost key
+            if isinstance(entry, dict) and 'policy' in entry:
+                yield (entry['policy'], entry['network_cache']), entry['seconds']
+
+    def save(self):
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+
+
+@functools.lru_cache(maxsize=None)
+def _line_count(path, mtime, size):
+    with open(path, 'rb') as f:
+        return sum(1 for _ in f)
+
+
+def n_requests(workload_spec):
+    """Requests of a workload: warmup plus measured, or the trace's lines"""
+    if 'n_measured' in workload_spec:
+        return workload_spec.get('n_warmup', 0) + workload_spec['n_measured']
+    path = workload_spec.get('reqs_file')
+    if path and os.path.exists(path):
+        st = os.stat(path)
+        return _line_count(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    return 1
+
+
+@functools.lru_cache(maxsize=None)
+def _mean_path_length(spec):
+    spec = dict(json.loads(spec))
+    topology = TOPOLOGY_FACTORY[spec.pop('name')](**spec)
+    return nx.average_shortest_path_length(topology)
+
+
+def mean_path_length(topology_spec):
+    """Mean shortest-path length of a topology, 1 if it cannot be built"""
+    try:
+        return _mean_path_length(json.dumps(dict(topology_spec), sort_keys=True, default=repr))
+    except Exception:
+        return 1.0
+
+
+class CostModel(object):
+    """Runtime estimates of experiments and jobs"""
+
+    def __init__(self, runtimes=None):
+        recorded = collections.defaultdict(list)
+        if runtimes is not None:
+            for key, seconds in runtimes.items():
+                if seconds is not None:
+                    recorded[key].append(seconds)
+        # cost key -> median recorded seconds
+        self.estimates = {key: statistics.median(seconds) for key, seconds in recorded.items()}
+        self.default = max(self.estimates.values(), default=None)
+
+    def model(self, experiment):
+        """Cost of an experiment in model units"""
+        policy = experiment.get('cache_policy', {}).get('name')
+        return (n_requests(experiment.get('workload', {}))
+                * mean_path_length(experiment.get('topology', {}))
+                * POLICY_COST.get(policy, 1.0))
+
+    def cost(self, experiment):
+        if self.default is None:
+            return self.model(experiment)
+        return self.estimates.get(cost_key(experiment), self.default)
+
+    def job_cost(self, job):
+        kind, experiments = job
+        costs = [self.cost(experiment) for experiment in experiments]
+        # plan() only groups sweeps it checked to be exact, which run in one
+        # pass instead of one run per experiment
+        return max(costs) if kind == 'sweep' else sum(costs)
+
+
+def schedule(jobs, model, n_processes):
+    """Order (replication, job) pairs longest first, splitting lockstep jobs
+    larger than a worker's share of the total cost
+    """
+    costs = [model.job_cost(job) for _, job in jobs]
+    share = sum(costs) / max(n_processes, 1)
+    tasks = []
+    for (replication, (kind, experiments)), cost in zip(jobs, costs):
+        n_chunks = min(len(experiments), math.ceil(cost / share)) if kind == 'lockstep' and share > 0 else 1
+        if n_chunks <= 1:
+            tasks.append((cost, replication, (kind, experiments)))
+            continue
+        for i in range(n_chunks):
+            chunk = experiments[i::n_chunks]
+            job = ('lockstep' if len(chunk) > 1 else 'single', chunk)
+            tasks.append((model.job_cost(job), replication, job))
+    tasks.sort(key=lambda task: task[0], reverse=True)
+    return [(replication, job) for _, replication, job in tasks]
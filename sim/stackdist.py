@@ -0,0 +1,273 @@
+"""One-pass LRU cache-size sweeps from Mattson stack distances.
+
+LRU is a stack algorithm: a request hits a cache of capacity C exactly when
+fewer than C distinct other contents were requested at that cache since the
+previous request for the same content. stack_distances() computes that
+distance for every request in O(n log n) with a Fenwick tree, so a single
+pass over the request stream yields the hit ratio of every capacity.
+
+run_lru_sweep() applies this to a group of LRU/LCE experiments that differ
+only in network_cache. The request stream reaching a cache does not depend
+on capacities as long as no request path crosses more than one cache, in
+which case the sweep is exact. The planner checks this on the topology's
+cache candidates with is_sweepable() and runs the experiments of other
+groups as separate jobs.
+"""
+import collections
+import copy
+import logging
+import time
+
+import numpy as np
+
+from icarus.execution import NetworkModel, NetworkView
+from icarus.registry import TOPOLOGY_FACTORY, WORKLOAD, CACHE_PLACEMENT, CONTENT_PLACEMENT
+from icarus.orchestration import run_scenario
+from icarus.util import Tree
+
+logger = logging.getLogger('sweep')
+
+# the only collectors whose results the sweep can reproduce
+SWEEP_COLLECTORS = {'CACHE_HIT_RATIO', 'LATENCY'}
+
+
+class NotSweepable(Exception):
+    pass
+
+
+def stack_distances(keys):
+    """Return the LRU stack distance of every access in keys: the number of
+    distinct other keys accessed since the previous access to the same key,
+    or -1 for a first access.
+    """
+    n = len(keys)
+    tree = [0] * (n + 1)
+    last = {}
+    res = [-1] * n
+    active = 0
+    for i, k in enumerate(keys):
+        p = last.get(k)
+        if p is None:
+            active += 1
+        else:
+            # markers sit at the latest access of every distinct key, the ones
+            # after p belong to keys accessed since
+            s = 0
+            j = p + 1
+            while j > 0:
+                s += tree[j]
+                j -= j & -j
+            res[i] = active - s
+            j = p + 1
+            while j <= n:
+                tree[j] -= 1
+                j += j & -j
+        j = i + 1
+        while j <= n:
+            tree[j] += 1
+            j += j & -j
+        last[k] = i
+    return res
+
+
+def lru_hits(keys, capacities):
+    """Return the number of LRU hits of keys for each capacity"""
+    d = np.array(stack_distances(keys))
+    d = np.sort(d[d >= 0])
+    return [int(np.searchsorted(d, c, side='left')) for c in capacities]
+
+
+def is_sweep_candidate(experiment, settings):
+    """An experiment can join an LRU sweep if it runs plain LRU with LCE and
+    only collects metrics the sweep reproduces
+    """
+    return (dict(experiment.get('cache_policy', {})) == {'name': 'LRU'}
+            and dict(experiment.get('strategy', {})) == {'name': 'LCE'}
+            and 'netconf' not in experiment
+            and 'network_cache' in experiment.get('cache_placement', {})
+            and set(settings.DATA_COLLECTORS) <= SWEEP_COLLECTORS)
+
+
+def cache_sizes(topology, workload, cachepl_spec):
+    """Place caches on a copy of topology, returning it and the size of
+    every cache as NetworkModel installs it (sizes below 1 are raised to 1)
+    """
+    spec = copy.deepcopy(dict(cachepl_spec))
+    name = spec.pop('name')
+    spec['cache_budget'] = workload.n_contents * spec.pop('network_cache')
+    # a networkx copy would share the node stacks the placement writes into
+    topo = copy.deepcopy(topology)
+    CACHE_PLACEMENT[name](topo, **spec)
+    return topo, {v: max(size, 1) for v, size in topo.cache_nodes().items()}
+
+
+def path_cache(path, cache_nodes):
+    """Return the cache a request along path meets, None if it meets none.
+
+    LCE looks up the caches of path[1:] and inserts into those of path[:-1]
+    up to the serving node, so a cache at the receiver is only inserted into.
+    Raises NotSweepable if the requests reaching a cache could depend on
+    capacities: the path meets two caches, or the source holds one (LCE
+    looks it up but does not insert into it on a miss).
+    """
+    caches = [v for v in path if v in cache_nodes]
+    if len(caches) > 1:
+        raise NotSweepable(f'path {path[0]} -> {path[-1]} crosses {len(caches)} caches')
+    if caches and caches[0] == path[-1] and len(path) > 1:
+        raise NotSweepable(f'source {path[-1]} holds a cache')
+    return caches[0] if caches else None
+
+
+def _network(experiments):
+    """Build the network of a sweep group: the view and cache nodes of its
+    largest configuration, the workload and the cache sizes of every
+    experiment
+    """
+    tree = copy.deepcopy(experiments[0])
+    topology_spec = dict(tree['topology'])
+    topology = TOPOLOGY_FACTORY[topology_spec.pop('name')](**topology_spec)
+    workload_spec = dict(tree['workload'])
+    workload = WORKLOAD[workload_spec.pop('name')](topology, **workload_spec)
+    if 'content_placement' in tree:
+        contpl_spec = dict(tree['content_placement'])
+        CONTENT_PLACEMENT[contpl_spec.pop('name')](topology, workload.contents, **contpl_spec)
+
+    configs = [cache_sizes(topology, workload, experiment['cache_placement']) for experiment in experiments]
+    cache_nodes = set()
+    for _, sizes in configs:
+        cache_nodes.update(sizes)
+    # routing and delays are the same for every capacity, take them from the
+    # largest configuration
+    topo = max(configs, key=lambda c: len(c[1]))[0]
+    view = NetworkView(NetworkModel(topo, {'name': 'LRU'}))
+    return view, cache_nodes, workload, [sizes for _, sizes in configs]
+
+
+def is_sweepable(experiments):
+    """True if the sweep of a group is exact on its topology: no path from a
+    receiver to a source meets more than one cache candidate, nor one at the
+    source. Cache placements only put caches on the topology's
+    icr_candidates, so the planner decides from the topology alone, without
+    building the workload or placing caches. Groups that are not sweepable
+    run as separate jobs instead of serially in one worker.
+    """
+    try:
+        topology_spec = dict(experiments[0]['topology'])
+        topology = TOPOLOGY_FACTORY[topology_spec.pop('name')](**topology_spec)
+        candidates = set(topology.graph['icr_candidates'])
+        view = NetworkView(NetworkModel(topology, {'name': 'LRU'}))
+        for receiver in topology.receivers():
+            for source in topology.sources():
+                if receiver != source:
+                    path_cache(view.shortest_path(receiver, source), candidates)
+    except NotSweepable as e:
+        logger.info('Not sweeping %d experiments (%s)', len(experiments), e)
+        return False
+    except Exception as e:
+        logger.info('Not sweeping %d experiments, network unknown (%s: %s)', len(experiments), type(e).__name__, e)
+        return False
+    return True
+
+
+def _path_delay(view, path):
+    return sum(view.link_delay(u, v) for u, v in zip(path[:-1], path[1:]))
+
+
+def run_lru_sweep(settings, experiments, curr_exp=0, n_exp=0):
+    """Run a group of LRU/LCE experiments differing only in network_cache in
+    one pass. Returns a list of (params, results, duration) like
+    icarus.orchestration.run_scenario, falling back to one run per
+    experiment if the sweep is not exact for this topology after all.
+    """
+    start = time.time()
+    try:
+        return _sweep(settings, experiments, start)
+    except NotSweepable as e:
+        logger.warning('Sweep of %d experiments not exact (%s), running them separately', len(experiments), e)
+        res = []
+        for i, experiment in enumerate(experiments):
+            r = run_scenario(settings, experiment, curr_exp + i, n_exp)
+            if r is not None:
+                res.append(r)
+        return res
+
+
+def _sweep(settings, experiments, start):
+    view, cache_nodes, workload, configs = _network(experiments)
+
+    routes = {}
+    # per cache: the contents of every access, and (latency saved, source)
+    # of the accesses that are measured lookups, None for the others
+    requests = {v: [] for v in cache_nodes}
+    measured = {v: [] for v in cache_nodes}
+    # logged requests per source, all of them server hits without caches
+    source_requests = collections.Counter()
+    miss_latency = 0.0
+    n_logged = 0
+    for _, event in workload:
+        receiver, content, log = event['receiver'], event['content'], event.get('log', True)
+        source = view.content_source(content)
+        route = routes.get((receiver, source))
+        if route is None:
+            path = view.shortest_path(receiver, source)
+            v = path_cache(path, cache_nodes)
+            miss = _path_delay(view, path) + _path_delay(view, view.shortest_path(source, receiver))
+            if v is None or v == receiver:
+                route = (v, miss, None)
+            else:
+                hit = (_path_delay(view, view.shortest_path(receiver, v))
+                       + _path_delay(view, view.shortest_path(v, receiver)))
+                route = (v, miss, miss - hit)
+            routes[receiver, source] = route
+        v, miss, save = route
+        if v is not None:
+            requests[v].append(content)
+            # only logged lookups are measured, warm-up requests and inserts
+            # at the receiver still fill caches
+            measured[v].append((save, source) if log and save is not None else None)
+        if log:
+            n_logged += 1
+            miss_latency += miss
+            source_requests[source] += 1
+
+    # per cache: the latency saved by each measured lookup and its source,
+    # by stack distance
+    per_node = {}
+    for v in cache_nodes:
+        d = np.array(stack_distances(requests[v]), dtype=np.int64)
+        logged = np.array([m is not None for m in measured[v]], dtype=bool)
+        d = d[logged]
+        m = [m for m in measured[v] if m is not None]
+        s = np.array([save for save, _ in m], dtype=float)
+        sources = np.array([source for _, source in m], dtype=object)
+        hit = d >= 0
+        order = np.argsort(d[hit], kind='stable')
+        per_node[v] = (d[hit][order], np.concatenate([[0.0], np.cumsum(s[hit][order])]), sources[hit][order])
+
+    duration = time.time() - start
+    res = []
+    for experiment, sizes in zip(experiments, configs):
+        hits = 0
+        saved = 0.0
+        node_hits = {}
+        server_hits = collections.Counter(source_requests)
+        for v, (dist, cum, sources) in per_node.items():
+            k = int(np.searchsorted(dist, sizes.get(v, 0), side='left'))
+            hits += k
+            saved += cum[k]
+            if k:
+                node_hits[v] = k
+                server_hits.subtract(sources[:k])
+        results = Tree()
+        if 'CACHE_HIT_RATIO' in settings.DATA_COLLECTORS:
+            # like CacheHitRatioCollector with its default per_node=True
+            n = n_logged if n_logged else 1
+            results['CACHE_HIT_RATIO']['MEAN'] = hits / n
+            results['CACHE_HIT_RATIO']['PER_NODE_CACHE_HIT_RATIO'] = {v: k / n for v, k in node_hits.items()}
+            results['CACHE_HIT_RATIO']['PER_NODE_SERVER_HIT_RATIO'] = {
+                source: k / n for source, k in server_hits.items() if k > 0}
+        if 'LATENCY' in settings.DATA_COLLECTORS:
+            results['LATENCY']['MEAN'] = (miss_latency - saved) / n_logged if n_logged else 0.0
+        res.append((experiment, results, duration / len(experiments)))
+    logger.info('Swept %d LRU cache sizes in one pass', len(experiments))
+    return res
@@ -0,0 +1,99 @@
+"""Declarative experiment queues.
+
+The configs used to build EXPERIMENT_QUEUE with copy.deepcopy(default) in
+nested loops, holding a full copy of the default Tree per grid point from
+the moment the config is imported. A Sweep holds the default Tree, the axes
+and the conditional overrides instead, and makes the experiments one at a
+time while it is iterated:
+
+    EXPERIMENT_QUEUE = Sweep(default, desc='{strategy} placement, {policy} replacement')
+    EXPERIMENT_QUEUE.axis('strategy', 'strategy.name', STRATEGIES)
+    EXPERIMENT_QUEUE.axis('policy', 'cache_policy.name', REPLACEMENT_POLICIES)
+    EXPERIMENT_QUEUE.axis('network_cache', 'cache_placement.network_cache', NETWORK_CACHE)
+    EXPERIMENT_QUEUE.override('cache_policy.segments', 1,
+                              when=lambda p: p['policy'] == 'SLRU' and p['network_cache'] < 0.001)
+
+The first axis varies slowest, like the outermost loop did. Conditions and
+desc see the grid point, a dict from axis name to value; desc is a format
+string over the axis names or a function of the point.
+
+Experiments are copy-on-write overlays of the default (see overlay()):
+only the subtrees along the set paths are copied, everything else is shared
+with the default Tree and must not be modified in place.
+"""
+import itertools
+
+from icarus.util import Tree
+
+
+def _path(path):
+    return tuple(path.split('.')) if isinstance(path, str) else tuple(path)
+
+
+def overlay(base, changes):
+    """Return a Tree equal to base with changes, a list of (path, value),
+    applied, sharing all subtrees of base that no path runs through
+    """
+    tree = Tree()
+    dict.update(tree, base)
+    # subtrees copied for this overlay, safe to modify
+    own = {id(tree)}
+    for path, value in changes:
+        node = tree
+        for key in path[:-1]:
+            child = node.get(key)
+            if child is None or id(child) not in own:
+                copy = Tree()
+                if child is not None:
+                    dict.update(copy, child)
+                node[key] = child = copy
+                own.add(id(child))
+            node = child
+        node[path[-1]] = value
+    return tree
+
+
+class Sweep(object):
+    """Grid of experiments over a default Tree, made lazily on iteration"""
+
+    def __init__(self, base, desc=None):
+        self.base = base
+        self.desc = desc
+        # axis name -> (path, values)
+        self.axes = {}
+        # (path, value, when)
+        self.overrides = []
+
+    def axis(self, name, path, values):
+        """Vary path over values, under the given name in grid points"""
+        self.axes[name] = (_path(path), list(values))
+        return self
+
+    def override(self, path, value, when):
+        """Set path to value in the experiments whose point satisfies when"""
+        self.overrides.append((_path(path), value, when))
+        return self
+
+    def points(self):
+        """Iterate over the grid points, dicts from axis name to value"""
+        names = list(self.axes)
+        for values in itertools.product(*(values for _, values in self.axes.values())):
+            yield dict(zip(names, values))
+
+    def experiment(self, point):
+        """Return the experiment of a grid point"""
+        changes = [(path, point[name]) for name, (path, _) in self.axes.items()]
+        changes.extend((path, value) for path, value, when in self.overrides if when(point))
+        if self.desc is not None:
+            desc = self.desc.format(**point) if isinstance(self.desc, str) else self.desc(point)
+            changes.append((('desc',), desc))
+        return overlay(self.base, changes)
+
+    def __len__(self):
+        n = 1
+        for _, values in self.axes.values():
+            n *= len(values)
+        return n
+
+    def __iter__(self):
+        return map(self.experiment, self.points())
@@ -0,0 +1,253 @@
+"""TTL caching on top of any replacement policy.
+
+TTL (registered as a cache policy) wraps an inner policy built with the
+node's cache size, so it works with NetworkModel as is: no ttl_cache
+decorator, no changes to network.py. Expiry times live in a hierarchical
+timer wheel (TimerWheel) that is advanced to the simulated time of the
+current request (see replay.py). Expired contents are removed as the wheel
+turns, not checked on every lookup.
+
+cache_policy:
+ * policy:     the inner policy (default 'LRU'), further arguments are
+               passed along to it
+ * ttl_source: where a content's expiry comes from
+     * constant:   ttl after insertion (default)
+     * writetimes: the nextWrite of the content's version, i.e. exactly when
+                   it goes stale; needs contentsWriteTimes.txt names and a
+                   workload clock in trace time (scaled by time_scale)
+     * table:      a per-content TTL from ttl_file (CSV lines content,ttl),
+                   ttl for contents missing from it
+ * ttl:        the TTL, None for no expiry
+ * ttl_file:   the per-content TTL table
+ * time_scale: workload time units per trace time unit (writetimes)
+ * tick:       resolution of the timer wheel (default 1.0)
+"""
+import csv
+import functools
+import math
+
+from icarus.models.cache import Cache
+from icarus.registry import CACHE_POLICY, register_cache_policy
+from icarus.util import inheritdoc
+
+import ds2os
+import policies
+import replay
+
+TTL_SOURCES = ('constant', 'writetimes', 'table')
+
+BITS = 6
+SLOTS = 1 << BITS
+MASK = SLOTS - 1
+
+
+class TimerWheel(object):
+    """Hierarchical timer wheel (Varghese and Lauck).
+
+    Level l has 64 slots of 64**l ticks each. A timer is placed on the lowest
+    level whose range covers its distance from now, and the timers of a
+    slot are moved down a level (cascaded) when the clock enters the slot.
+    Timers beyond the top level wait in an overflow set that is cascaded
+    once per top-level revolution. advance() skips stretches without due
+    timers, so its cost depends on the timers fired and cascaded, not on
+    the simulated time elapsed.
+    """
+
+    def __init__(self, tick=1.0, levels=6):
+        self.tick = tick
+        self.levels = levels
+        self.slots = [[set() for _ in range(SLOTS)] for _ in range(levels)]
+        self.counts = [0] * levels
+        self.overflow = set()
+        self.now = 0
+        # key -> (tick, level, slot), level -1 for the overflow
+        self._timers = {}
+
+    def __len__(self):
+        return len(self._timers)
+
+    def __contains__(self, key):
+        return key in self._timers
+
+    def _place(self, key, t):
+        delta = t - self.now
+        for level in range(self.levels):
+            if delta < 1 << (BITS * (level + 1)):
+                slot = (t >> (BITS * level)) & MASK
+                self.slots[level][slot].add(key)
+                self.counts[level] += 1
+                self._timers[key] = (t, level, slot)
+                return
+        self.overflow.add(key)
+        self._timers[key] = (t, -1, 0)
+
+    def schedule(self, key, time):
+        """Fire key at the given time (at the next tick if it has passed)"""
+        if key in self._timers:
+            self.cancel(key)
+        self._place(key, max(int(math.ceil(time / self.tick)), self.now + 1))
+
+    def cancel(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is None:
+            return False
+        _, level, slot = timer
+        if level < 0:
+            self.overflow.discard(key)
+        else:
+            self.slots[level][slot].discard(key)
+            self.counts[level] -= 1
+        return True
+
+    def _cascade(self, keys):
+        for key in keys:
+            t = self._timers[key][0]
+            self._place(key, t)
+
+    def _enter(self, now):
+        """Move the clock to now, cascading the slots it enters"""
+        self.now = now
+        if now % (1 << (BITS * self.levels)) == 0 and self.overflow:
+            keys = list(self.overflow)
+            self.overflow.clear()
+            self._cascade(keys)
+        for level in range(self.levels - 1, 0, -1):
+            if now % (1 << (BITS * level)) == 0:
+                slot = self.slots[level][(now >> (BITS * level)) & MASK]
+                if slot:
+                    keys = list(slot)
+                    slot.clear()
+                    self.counts[level] -= len(keys)
+                    self._cascade(keys)
+
+    def advance(self, time):
+        """Move the clock to the given time, returning the keys that fired"""
+        target = int(time // self.tick)
+        fired = []
+        while self.now < target:
+            if not self._timers:
+                self.now = target
+                break
+            if self.counts[0]:
+                # the next busy slot of this revolution, or its end
+                nxt = self.now + 1
+                end = ((self.now >> BITS) + 1) << BITS
+                while nxt < end and not self.slots[0][nxt & MASK]:
+                    nxt += 1
+            else:
+                level = next((l for l, c in enumerate(self.counts) if c), self.levels)
+                nxt = ((self.now >> (BITS * level)) + 1) << (BITS * level)
+            if nxt > target:
+                self.now = target
+                break
+            self._enter(nxt)
+            slot = self.slots[0][nxt & MASK]
+            if slot:
+                due = [key for key in slot if self._timers[key][0] <= nxt]
+                for key in due:
+                    self.cancel(key)
+                fired.extend(due)
+        return fired
+
+
+@functools.lru_cache(maxsize=None)
+def ttl_table(path):
+    """Read a per-content TTL table, interning content names"""
+    table = ds2os.content_table()
+    ttls = {}
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or row[0] == 'content':
+                continue
+            ttls[row[0]] = ttls[table.intern(row[0])] = float(row[1])
+    return ttls
+
+
+@register_cache_policy('TTL')
+class TtlCache(Cache):
+    """Cache whose contents expire after a TTL, evicted by an inner policy
+    when full. A content whose expiry has already passed is not cached.
+    """
+
+    @inheritdoc(Cache)
+    def __init__(self, maxlen, policy='LRU', ttl_source='constant', ttl=None, ttl_file=None,
+                 time_scale=1.0, tick=1.0, **kwargs):
+        if ttl_source not in TTL_SOURCES:
+            raise ValueError(f'ttl_source must be one of {", ".join(TTL_SOURCES)}')
+        if ttl_source == 'table' and ttl_file is None:
+            raise ValueError('ttl_source table needs a ttl_file')
+        self._cache = CACHE_POLICY[policy](maxlen, **kwargs)
+        self._replay = replay.current()
+        self._wheel = TimerWheel(tick)
+        self._source = ttl_source
+        self._ttl = ttl
+        self._table = ttl_table(ttl_file) if ttl_source == 'table' else None
+        self._times = policies.write_times() if ttl_source == 'writetimes' else None
+        self._time_scale = time_scale
+        self.expired = 0
+
+    def _expiry(self, k, now):
+        if self._source == 'writetimes':
+            return self._times[k][1] * self._time_scale
+        ttl = self._table.get(k, self._ttl) if self._table is not None else self._ttl
+        return math.inf if ttl is None else now + ttl
+
+    def _expire(self):
+        for k in self._wheel.advance(self._replay.time):
+            self._cache.remove(k)
+            self.expired += 1
+
+    @inheritdoc(Cache)
+    def __len__(self):
+        self._expire()
+        return len(self._cache)
+
+    @property
+    @inheritdoc(Cache)
+    def maxlen(self):
+        return self._cache.maxlen
+
+    @inheritdoc(Cache)
+    def dump(self):
+        self._expire()
+        return self._cache.dump()
+
+    @inheritdoc(Cache)
+    def position(self, k):
+        self._expire()
+        return self._cache.position(k)
+
+    @inheritdoc(Cache)
+    def has(self, k):
+        self._expire()
+        return self._cache.has(k)
+
+    @inheritdoc(Cache)
+    def get(self, k):
+        self._expire()
+        return self._cache.get(k)
+
+    @inheritdoc(Cache)
+    def put(self, k):
+        self._expire()
+        now = self._replay.time
+        expiry = self._expiry(k, now)
+        if expiry <= now:
+            return None
+        fresh = not self._cache.has(k)
+        evicted = self._cache.put(k)
+        if evicted is not None:
+            self._wheel.cancel(evicted)
+        if fresh and evicted != k and expiry != math.inf:
+            self._wheel.schedule(k, expiry)
+        return evicted
+
+    @inheritdoc(Cache)
+    def remove(self, k):
+        self._wheel.cancel(k)
+        return self._cache.remove(k)
+
+    @inheritdoc(Cache)
+    def clear(self):
+        self._wheel = TimerWheel(self._wheel.tick)
+        self._cache.clear()
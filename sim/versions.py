@@ -0,0 +1,312 @@
+"""Version-aware caching of DS2OS contents.
+
+The DS2OS workloads name every version of a sensor value as its own content
+('/agent1/tempin1/v1150', '/agent1/tempin1/v1151', ...). Once a newer version
+is written, the old one can never be hit again, yet plain policies keep it
+until it ages out. This module replays the trace's writes alongside the
+requests (WriteReplay) and provides:
+
+ * VERSIONED:        a cache keyed by address that holds at most one version
+                     per address and drops it as soon as the address is
+                     written, wrapping any policy for the eviction order
+ * STALE_OCCUPANCY:  a collector reporting the share of occupied cache slots
+                     that hold dead entries, written since they were cached,
+                     i.e. the capacity wasted by per-version keys
+
+Writes are taken from the workload's reqs_file. The workload's requests must
+be the trace's reads in trace order, which is checked while replaying.
+Content IDs from ds2os.install() are resolved through the intern table,
+content name strings work as well.
+
+cache_policy for VERSIONED:
+ * policy: the policy ordering the addresses (default 'LRU'), its arguments
+           are passed along. It sees address IDs instead of contents, so
+           only policies that merely order the keys they are given are
+           accepted (ADDRESS_POLICIES); MIN, LFF, MDMR or PERFECT_LFU read
+           the content behind a key and would misinterpret addresses.
+"""
+
+import numpy as np
+
+from icarus.execution.collectors import DataCollector
+from icarus.models.cache import Cache
+from icarus.registry import CACHE_POLICY, register_cache_policy, register_data_collector
+from icarus.util import Tree, inheritdoc
+
+import paths
+import ds2os
+import replay
+import tracestore
+
+# policies ordering whatever keys they get, which VERSIONED can wrap
+ADDRESS_POLICIES = ('LRU', 'FIFO', 'SLRU', 'RAND', 'IN_CACHE_LFU')
+
+
+class WriteReplay(object):
+    """Apply the trace's writes between the requests of a replayed workload.
+
+    A write between read i-1 and read i is applied right before request i is
+    served: caches listening for it drop their copy of the address, then the
+    listeners are called with the address.
+    """
+
+    def __init__(self, reqs_file):
+        self.table = ds2os.content_table()
+        trace = tracestore.open_trace(reqs_file)
+        lookup = np.array([self.table.intern_address(a) for a in trace.labels('accessedNodeAddress')], dtype=np.int64)
+        address = lookup[np.asarray(trace['accessedNodeAddress'])] if len(lookup) else np.zeros(len(trace), dtype=np.int64)
+        reads = np.flatnonzero(trace.mask('operation', 'read'))
+        writes = np.flatnonzero(trace.mask('operation', 'write'))
+        self.read_address = address[reads].tolist()
+        # the read each write precedes
+        self.write_epoch = np.searchsorted(reads, writes).tolist()
+        self.write_address = address[writes].tolist()
+        self._next = 0
+        # address -> epoch of its latest applied write
+        self.last_write = {}
+        self.caches = []
+        self.listeners = []
+
+    def address(self, k):
+        """Address ID of a content ID or content name"""
+        return ds2os.content_address(k)
+
+    def __call__(self, i, t, event):
+        epoch = self.write_epoch
+        while self._next < len(epoch) and epoch[self._next] <= i:
+            a = self.write_address[self._next]
+            self.last_write[a] = epoch[self._next]
+            for cache in self.caches:
+                cache.invalidate(a)
+            for listener in self.listeners:
+                listener(a)
+            self._next += 1
+        content = event['content']
+        if i >= len(self.read_address) or self.address(content) != self.read_address[i]:
+            raise ValueError(f'request {i} for {content} does not match read {i} of the trace')
+
+
+def write_replay():
+    """Return the WriteReplay of the current experiment, attaching it to the
+    replayed workload on first use
+    """
+    r = replay.current()
+    writes = getattr(r, 'writes', None)
+    if writes is None:
+        reqs_file = r.spec.get('reqs_file')
+        if reqs_file is None:
+            raise ValueError('version-aware caching needs a trace-driven workload with a reqs_file')
+        writes = r.writes = WriteReplay(reqs_file)
+        r.hooks.append(writes)
+    return writes
+
+
+@register_cache_policy('VERSIONED')
+class VersionedCache(Cache):
+    """Cache keyed by (address, version) that keeps one version per address.
+
+    The wrapped policy orders addresses; a request hits only if the cached
+    version is the requested one. Writes to a cached address evict it
+    immediately, so superseded versions never occupy capacity.
+    """
+
+    @inheritdoc(Cache)
+    def __init__(self, maxlen, policy='LRU', **kwargs):
+        if policy not in ADDRESS_POLICIES:
+            raise ValueError(f'VERSIONED keys its policy by address, policy must be one of '
+                             f'{", ".join(ADDRESS_POLICIES)}')
+        self._cache = CACHE_POLICY[policy](maxlen, **kwargs)
+        # address -> cached content
+        self._version = {}
+        self._writes = write_replay()
+        self._writes.caches.append(self)
+        self.invalidated = 0
+
+    @inheritdoc(Cache)
+    def __len__(self):
+        return len(self._version)
+
+    @property
+    @inheritdoc(Cache)
+    def maxlen(self):
+        return self._cache.maxlen
+
+    @inheritdoc(Cache)
+    def dump(self):
+        return [self._version[a] for a in self._cache.dump()]
+
+    @inheritdoc(Cache)
+    def position(self, k):
+        if not self.has(k):
+            raise ValueError('The item %s is not in the cache' % str(k))
+        return self._cache.position(self._writes.address(k))
+
+    @inheritdoc(Cache)
+    def has(self, k):
+        return self._version.get(self._writes.address(k)) == k
+
+    @inheritdoc(Cache)
+    def get(self, k):
+        a = self._writes.address(k)
+        if self._version.get(a) != k:
+            return False
+        return self._cache.get(a)
+
+    @inheritdoc(Cache)
+    def put(self, k):
+        a = self._writes.address(k)
+        self._version[a] = k
+        evicted = self._cache.put(a)
+        if evicted is None:
+            return None
+        return self._version.pop(evicted)
+
+    @inheritdoc(Cache)
+    def remove(self, k):
+        if not self.has(k):
+            return False
+        return self.invalidate(self._writes.address(k))
+
+    def invalidate(self, a):
+        """Drop whatever version of address a is cached"""
+        if a not in self._version:
+            return False
+        del self._version[a]
+        self._cache.remove(a)
+        self.invalidated += 1
+        return True
+
+    @inheritdoc(Cache)
+    def clear(self):
+        self._version.clear()
+        self._cache.clear()
+
+
+class TrackedCache(object):
+    """Wrap a cache, keeping count of its entries and of the dead ones, whose
+    address was written after they were inserted.
+
+    The counts follow puts, evictions, removals and writes. Entries the
+    wrapped policy drops on its own (e.g. expired TTL entries) show up as a
+    length mismatch and are reconciled from a dump.
+    """
+
+    def __init__(self, cache, writes):
+        self.cache = cache
+        self.writes = writes
+        # address -> contents inserted since its latest write
+        self.fresh = {}
+        self.dead = set()
+        self.n = 0
+
+    def __getattr__(self, name):
+        if name == 'cache':
+            raise AttributeError(name)
+        return getattr(self.cache, name)
+
+    def __len__(self):
+        return len(self.cache)
+
+    def _add(self, k):
+        keys = self.fresh.setdefault(self.writes.address(k), set())
+        if k in self.dead:
+            # a fresh copy replaces the dead one
+            self.dead.discard(k)
+        elif k not in keys:
+            self.n += 1
+        keys.add(k)
+
+    def _drop(self, k):
+        keys = self.fresh.get(self.writes.address(k), ())
+        if k in keys:
+            keys.discard(k)
+        elif k in self.dead:
+            self.dead.discard(k)
+        else:
+            return
+        self.n -= 1
+
+    def put(self, k):
+        evicted = self.cache.put(k)
+        # policies may reject k by returning it
+        if evicted != k:
+            self._add(k)
+            if evicted is not None:
+                self._drop(evicted)
+        return evicted
+
+    def remove(self, k):
+        removed = self.cache.remove(k)
+        if removed:
+            self._drop(k)
+        return removed
+
+    def clear(self):
+        self.cache.clear()
+        self.fresh.clear()
+        self.dead.clear()
+        self.n = 0
+
+    def written(self, a):
+        """Mark the entries of address a dead, forgetting those the policy
+        dropped on the write
+        """
+        for k in self.fresh.pop(a, ()):
+            if self.cache.has(k):
+                self.dead.add(k)
+            else:
+                self.n -= 1
+
+    def counts(self):
+        """Return the number of entries and of dead entries"""
+        n = len(self.cache)
+        if n != self.n:
+            cached = set(self.cache.dump())
+            self.dead &= cached
+            for a in list(self.fresh):
+                self.fresh[a] &= cached
+            tracked = self.dead.union(*self.fresh.values())
+            for k in cached - tracked:
+                self.fresh.setdefault(self.writes.address(k), set()).add(k)
+            self.n = n
+        return n, len(self.dead)
+
+
+@register_data_collector('STALE_OCCUPANCY')
+class StaleOccupancyCollector(DataCollector):
+    """Collector measuring the cache capacity held by dead entries.
+
+    It wraps every cache of the model in a TrackedCache, so a measured
+    request reads two counters per cache instead of scanning the caches. An
+    entry is dead if its address was written after it was inserted: a
+    superseded version, or an unversioned address cached before its latest
+    write.
+    """
+
+    def __init__(self, view, **params):
+        self.view = view
+        self.writes = write_replay()
+        caches = view.model.cache
+        self.caches = []
+        for node in list(caches):
+            tracked = caches[node] = TrackedCache(caches[node], self.writes)
+            self.caches.append(tracked)
+            self.writes.listeners.append(tracked.written)
+        self.occupied = 0
+        self.dead = 0
+        self.sess_count = 0
+
+    @inheritdoc(DataCollector)
+    def start_session(self, timestamp, receiver, content):
+        self.sess_count += 1
+        for cache in self.caches:
+            n, dead = cache.counts()
+            self.occupied += n
+            self.dead += dead
+
+    @inheritdoc(DataCollector)
+    def results(self):
+        return Tree({
+            'MEAN': self.dead / self.occupied if self.occupied else 0.0,
+            'MEAN_DEAD_ENTRIES': self.dead / self.sess_count if self.sess_count else 0.0,
+        })
@@ -197,10 +197,10 @@ can inspect the source code which is well organized and documented:
  * Cache eviction policy implementations are located in ./icarus/models/cache.py
 """
 from multiprocessing import cpu_count
-from collections import deque
-import copy
 from icarus.util import Tree
 
+from sweep import Sweep
+
 ############################## GENERAL SETTINGS ##############################
 
 # Level of logging output
@@ -304,9 +304,6 @@ STRATEGIES = [
     'RAND_BERNOULLI',  # Random Bernoulli: cache randomly in caches on path
 ]
 
-# Instantiate experiment queue
-EXPERIMENT_QUEUE = deque()
-
 # Build a default experiment configuration which is going to be used by all
 # experiments of the campaign
 default = Tree()
@@ -319,16 +316,11 @@ default['cache_placement']['name'] = 'UNIFORM'
 default['content_placement']['name'] = 'UNIFORM'
 default['cache_policy']['name'] = CACHE_POLICY
 
-# Create experiments multiplexing all desired parameters
-for alpha in ALPHA:
-    for strategy in STRATEGIES:
-        for topology in TOPOLOGIES:
-            for network_cache in NETWORK_CACHE:
-                experiment = copy.deepcopy(default)
-                experiment['workload']['alpha'] = alpha
-                experiment['strategy']['name'] = strategy
-                experiment['topology']['name'] = topology
-                experiment['cache_placement']['network_cache'] = network_cache
-                experiment['desc'] = "Alpha: %s, strategy: %s, topology: %s, network cache: %s" \
-                                     % (str(alpha), strategy, topology, str(network_cache))
-                EXPERIMENT_QUEUE.append(experiment)
+# Create experiments multiplexing all desired parameters, built lazily from
+# default by the experiment runner (see sim/sweep.py)
+EXPERIMENT_QUEUE = Sweep(default, desc='Alpha: {alpha}, strategy: {strategy}, topology: {topology}, '
+                                       'network cache: {network_cache}')
+EXPERIMENT_QUEUE.axis('alpha', 'workload.alpha', ALPHA)
+EXPERIMENT_QUEUE.axis('strategy', 'strategy.name', STRATEGIES)
+EXPERIMENT_QUEUE.axis('topology', 'topology.name', TOPOLOGIES)
+EXPERIMENT_QUEUE.axis('network_cache', 'cache_placement.network_cache', NETWORK_CACHE)
@@ -197,10 +197,10 @@ can inspect the source code which is well organized and documented:
  * Cache eviction policy implementations are located in ./icarus/models/cache.py
 """
 from multiprocessing import cpu_count
-from collections import deque
-import copy
 from icarus.util import Tree
 
+from sweep import Sweep
+
 ############################## GENERAL SETTINGS ##############################
 
 # Level of logging output
@@ -278,9 +278,6 @@ NETWORK_CACHE = [(capacity / N_CONTENTS) for capacity in NETWORK_CAPACITY]
 # Create experiment
 default = Tree()
 
-# Instantiate experiment queue
-EXPERIMENT_QUEUE = deque()
-
 default['topology']['name'] = 'TS'
 
 # Set placement strategy
@@ -310,15 +307,13 @@ REPLACEMENT_POLICIES = [
     # 'MDMR', problematic because many producers only offer one content chunk address // could extend to location, i.e. replace data from garage for data from garage etc.
 ]
 
-# Create experiments multiplexing all desired parameters
-for alpha in ALPHA:
-    for policy in REPLACEMENT_POLICIES:
-        for network_cache in NETWORK_CACHE:
-            experiment = copy.deepcopy(default)
-            experiment['workload']['alpha'] = alpha
-            experiment['cache_policy']['name'] = policy
-            experiment['cache_placement']['network_cache'] = network_cache
-            experiment['desc'] = f'Topology: TransitStub, Alpha: {alpha}, LCE placement strategy, {policy} replacement, {network_cache} network cache'
-            if policy == 'SLRU' and (network_cache * N_CONTENTS) / N_CACHING_NODES < 2:
-                experiment['cache_policy']['segments'] = 1
-            EXPERIMENT_QUEUE.append(experiment)
+# Create experiments multiplexing all desired parameters, built lazily from
+# default by the experiment runner (see sim/sweep.py)
+EXPERIMENT_QUEUE = Sweep(default, desc='Topology: TransitStub, Alpha: {alpha}, LCE placement strategy, '
+                                       '{policy} replacement, {network_cache} network cache')
+EXPERIMENT_QUEUE.axis('alpha', 'workload.alpha', ALPHA)
+EXPERIMENT_QUEUE.axis('policy', 'cache_policy.name', REPLACEMENT_POLICIES)
+EXPERIMENT_QUEUE.axis('network_cache', 'cache_placement.network_cache', NETWORK_CACHE)
+# SLRU needs at least 2 objects per cache for 2 segments
+EXPERIMENT_QUEUE.override('cache_policy.segments', 1,
+                          when=lambda p: p['policy'] == 'SLRU' and p['network_cache'] * N_CONTENTS / N_CACHING_NODES < 2)
@@ -0,0 +1,113 @@
+"""Single-pass generation and checking of the DS2OS content catalogues.
+
+One streaming pass over subTraceWriteTimes.csv (which carries the version,
+lastWrite and nextWrite columns) collects all three catalogues at once:
+
+ * contents.txt:           address/vN
+ * contentsWriteTimes.txt: address/lastWrite/nextWrite
+ * contentsNoVersions.txt: address
+
+together with the number of read requests for every object, so the
+catalogues can no longer drift apart from each other or from the trace.
+Catalogue files are written without a trailing newline, which is why
+`wc -l contentsWriteTimes.txt` reports one line fewer than its 56595 objects.
+
+check() verifies an existing catalogue against a trace with a hash join:
+the catalogue is loaded into a set once and every read is probed against it.
+
+Usage from the repository root:
+
+    python trace/catalogue.py trace/subTraceWriteTimes.csv
+    python trace/catalogue.py --check trace/subTraceWriteTimes.csv
+"""
+import argparse
+import csv
+import os
+
+# catalogue kind -> file name
+CATALOGUES = {
+    'version':    'contents.txt',
+    'writetimes': 'contentsWriteTimes.txt',
+    'address':    'contentsNoVersions.txt',
+}
+
+COUNTS_FILE = 'contentRequests.csv'
+
+
+def scan(path):
+    """Collect every catalogue from one pass over a write-time annotated trace.
+
+    Returns a dict mapping each kind in CATALOGUES to a dict from content name
+    to its number of read requests, in order of first appearance.
+    """
+    catalogues = {kind: {} for kind in CATALOGUES}
+    versions = catalogues['version']
+    writetimes = catalogues['writetimes']
+    addresses = catalogues['address']
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        node = header.index('accessedNodeAddress')
+        op = header.index('operation')
+        version = header.index('version')
+        last = header.index('lastWrite')
+        nxt = header.index('nextWrite')
+        for row in reader:
+            address = row[node]
+            read = 1 if row[op] == 'read' else 0
+            name = f'{address}/v{row[version]}'
+            versions[name] = versions.get(name, 0) + read
+            name = f'{address}/{row[last]}/{row[nxt]}'
+            writetimes[name] = writetimes.get(name, 0) + read
+            addresses[address] = addresses.get(address, 0) + read
+    return catalogues
+
+
+def write_catalogue(path, names):
+    with open(path, 'w') as f:
+        f.write('\n'.join(names))
+
+
+def write_counts(path, catalogues):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['catalogue', 'content', 'requests'])
+        for kind, counts in catalogues.items():
+            for name, requests in counts.items():
+                writer.writerow([CATALOGUES[kind], name, requests])
+
+
+def check(counts, catalogue_path):
+    """Return the requested objects missing from a catalogue file, given the
+    request counts scan() collected for the catalogue's kind
+    """
+    with open(catalogue_path) as f:
+        catalogue = set(line.strip() for line in f)
+    missing = {}
+    for name, requests in counts.items():
+        if requests and name not in catalogue:
+            missing[name] = requests
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write or check the content catalogues of a trace')
+    parser.add_argument('trace', help='the annotated trace, e.g. trace/subTraceWriteTimes.csv')
+    parser.add_argument('-o', '--output', help='directory of the catalogues (default: next to the trace)')
+    parser.add_argument('--check', action='store_true', help='check the existing catalogues instead of writing them')
+    args = parser.parse_args()
+    out_dir = args.output or os.path.dirname(args.trace)
+    catalogues = scan(args.trace)
+    if args.check:
+        for kind, name in CATALOGUES.items():
+            missing = check(catalogues[kind], os.path.join(out_dir, name))
+            print(name, 'ok' if not missing else f'{len(missing)} requested objects missing')
+        return
+    for kind, counts in catalogues.items():
+        write_catalogue(os.path.join(out_dir, CATALOGUES[kind]), counts)
+        print(CATALOGUES[kind], len(counts), 'objects')
+    write_counts(os.path.join(out_dir, COUNTS_FILE), catalogues)
+
+
+if __name__ == '__main__':
+    main()
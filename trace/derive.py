@@ -0,0 +1,212 @@
+"""Content-addressed cache of the artifacts derived from the DS2OS trace.
+
+Every derived file is produced by a transform from one source file:
+
+    fullTrace.csv -> subTrace2.csv -> subTraceWriteTimes.csv
+                     subTraceWriteTimes.csv -> contents.txt, contentsWriteTimes.txt,
+                                               contentsNoVersions.txt, contentRequests.csv
+
+An artifact is named by a hash of its source (the file digest for
+fullTrace.csv, the source's own key for derived sources) and of the transform
+name, version and parameters. It is stored once under trace/derived/<key>/
+and hard-linked to its usual place in trace/, so a rebuild only runs the
+transforms whose inputs or parameters changed.
+
+Usage from the repository root (or via `make derive` in an experiment dir):
+
+    python trace/derive.py [artifact ...]
+"""
+import argparse
+import functools
+import hashlib
+import json
+import os
+import shutil
+
+import catalogue
+import pipeline
+import writetimes
+import tracestore
+
+TRACE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DERIVED_DIR = os.path.join(TRACE_DIR, 'derived')
+
+# digests of source files, keyed by path, size and mtime so a multi-gigabyte
+# trace is only hashed again after it changed
+DIGESTS_FILE = os.path.join(DERIVED_DIR, 'digests.json')
+
+
+def _subtrace(src, dst, agents):
+    pipeline.extract_subtrace(src, dst, frozenset(agents))
+
+
+def _writetimes(src, dst):
+    writetimes.write_annotated(src, dst, writetimes.annotate_write_times(tracestore.open_trace(src)))
+
+
+@functools.lru_cache(maxsize=1)
+def _scan(src, mtime):
+    return catalogue.scan(src)
+
+
+def _catalogue(src, dst, kind):
+    # all catalogues come from the same pass, which is memoized for the run
+    catalogue.write_catalogue(dst, _scan(src, os.path.getmtime(src))[kind])
+
+
+def _counts(src, dst):
+    catalogue.write_counts(dst, _scan(src, os.path.getmtime(src)))
+
+
+# name -> (function, version); bump the version when a transform's output changes
+TRANSFORMS = {
+    'subtrace':   (_subtrace, 1),
+    'writetimes': (_writetimes, 1),
+    'catalogue':  (_catalogue, 2),
+    'counts':     (_counts, 1),
+}
+
+# artifact -> (source, transform, parameters)
+ARTIFACTS = {
+    'subTrace2.csv':          ('fullTrace.csv', 'subtrace', {'agents': sorted(pipeline.AGENTS)}),
+    'subTraceWriteTimes.csv': ('subTrace2.csv', 'writetimes', {}),
+    'contents.txt':           ('subTraceWriteTimes.csv', 'catalogue', {'kind': 'version'}),
+    'contentsNoVersions.txt': ('subTraceWriteTimes.csv', 'catalogue', {'kind': 'address'}),
+    'contentsWriteTimes.txt': ('subTraceWriteTimes.csv', 'catalogue', {'kind': 'writetimes'}),
+    'contentRequests.csv':    ('subTraceWriteTimes.csv', 'counts', {}),
+}
+
+
+def _load_digests(path=DIGESTS_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_digests(digests, path=DIGESTS_FILE):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(digests, f, indent=1)
+    os.replace(tmp, path)
+
+
+def file_digest(path, digests=None):
+    """sha256 of a file, memoized by (size, mtime) in digests"""
+    st = os.stat(path)
+    stamp = [st.st_size, st.st_mtime_ns]
+    entry = digests.get(path) if digests is not None else None
+    if entry and entry['stamp'] == stamp:
+        return entry['sha256']
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    if digests is not None:
+        digests[path] = {'stamp': stamp, 'sha256': h.hexdigest()}
+    return h.hexdigest()
+
+
+class Deriver(object):
+
+    def __init__(self, trace_dir=TRACE_DIR, derived_dir=DERIVED_DIR):
+        self.trace_dir = trace_dir
+        self.derived_dir = derived_dir
+        self.digests_file = os.path.join(derived_dir, os.path.basename(DIGESTS_FILE))
+        self.digests = _load_digests(self.digests_file)
+        self.keys = {}
+        self.built = set()
+
+    def key(self, name):
+        """The content address of a file: its digest for source files, a hash
+        of source key, transform and parameters for artifacts
+        """
+        if name in self.keys:
+            return self.keys[name]
+        if name not in ARTIFACTS or not self.has_sources(name):
+            # source files, and artifacts whose raw trace is not available, are
+            # addressed by their own content
+            key = file_digest(os.path.join(self.trace_dir, name), self.digests)
+        else:
+            source, transform, params = ARTIFACTS[name]
+            spec = {
+                'source': self.key(source),
+                'transform': transform,
+                'version': TRANSFORMS[transform][1],
+                'params': params,
+            }
+            key = hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+        self.keys[name] = key
+        return key
+
+    def has_sources(self, name):
+        while name in ARTIFACTS:
+            name = ARTIFACTS[name][0]
+        return os.path.exists(os.path.join(self.trace_dir, name))
+
+    def stored(self, name):
+        return os.path.join(self.derived_dir, self.key(name)[:16], name)
+
+    def build(self, name):
+        """Make trace/<name> up to date, running its transform only if no
+        artifact with the same key is stored yet. Returns True if it ran.
+        """
+        if name in self.built:
+            return False
+        self.built.add(name)
+        target = os.path.join(self.trace_dir, name)
+        source, transform, params = ARTIFACTS[name]
+        source_path = os.path.join(self.trace_dir, source)
+        if not self.has_sources(name):
+            # the raw trace is not shipped with the repository, keep what is there
+            if os.path.exists(target):
+                print(f'{name}: source trace missing, keeping existing file')
+            else:
+                print(f'warning: {name}: skipped, it needs {source_path}')
+            return False
+        if source in ARTIFACTS:
+            self.build(source)
+        stored = self.stored(name)
+        ran = False
+        if not os.path.exists(stored):
+            os.makedirs(os.path.dirname(stored), exist_ok=True)
+            tmp = stored + '.tmp'
+            TRANSFORMS[transform][0](source_path, tmp, **params)
+            os.replace(tmp, stored)
+            ran = True
+        _materialize(stored, target)
+        print(f'{name}: {"built" if ran else "up to date"} ({self.key(name)[:16]})')
+        return ran
+
+    def close(self):
+        os.makedirs(self.derived_dir, exist_ok=True)
+        _save_digests(self.digests, self.digests_file)
+
+
+def _materialize(stored, target):
+    """Point target at the stored artifact, by hard link where possible"""
+    if os.path.exists(target) and os.path.samefile(stored, target):
+        return
+    tmp = target + '.tmp'
+    try:
+        os.link(stored, tmp)
+    except OSError:
+        shutil.copyfile(stored, tmp)
+    os.replace(tmp, target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild stale derived trace artifacts')
+    parser.add_argument('artifacts', nargs='*', help=f'artifacts to build (default: all of {", ".join(ARTIFACTS)})')
+    args = parser.parse_args()
+    deriver = Deriver()
+    try:
+        for name in args.artifacts or ARTIFACTS:
+            deriver.build(name)
+    finally:
+        deriver.close()
+
+
+if __name__ == '__main__':
+    main()
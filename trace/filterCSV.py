@@ -19,37 +19,25 @@ import matplotlib.pyplot as plt
 from datetime import datetime
 from collections import Counter
 
+import tracestore
+import traceindex
+import interarrival
+import sketch
+
 res = []
 agents = set()
 edges  = set()
 services = set()
 
-trace = []
+trace = None
 
 lastWrite = 0
 tempin3interUpdateTimes = []
 
 def setup():
-    with open('trace/fullTrace.csv', 'rt') as f:
-        reader = csv.reader(f, delimiter=',')
-        next(reader) # skip the first row / header
-        for row in reader:
-            sourceID,sourceAddress,sourceType,sourceLocation,destinationServiceAddress,destinationServiceType,destinationLocation,accessedNodeAddress,accessedNodeType,operation,value,timestamp,normality = row
-            trace.append({
-                'sourceID': sourceID,
-                'sourceAddress': sourceAddress,
-                'sourceType': sourceType,
-                'sourceLocation': sourceLocation,
-                'destinationServiceAddress': destinationServiceAddress,
-                'destinationServiceType': destinationServiceType,
-                'destinationLocation': destinationLocation,
-                'accessedNodeAddress': accessedNodeAddress,
-                'accessedNodeType': accessedNodeType,
-                'operation': operation,
-                'value': value,
-                'timestamp': timestamp,
-                'normality': normality
-            })
+    # parses fullTrace.csv only on first use, afterwards the columnar store is memory-mapped
+    global trace
+    trace = tracestore.open_trace('trace/fullTrace.csv')
 
 def draw_graph(graph):
     # extract nodes from graph
@@ -77,9 +65,7 @@ def draw_graph(graph):
 
 
 def plotWriteInterarrivalTimes(sensor='tempin3'):
-    normalRequests = [request for request in trace if request['normality'] == 'normal']
-    updates = [r for r in normalRequests if r['sourceID'] == sensor and r['operation'] == 'write']
-    interarrivaltimes = [int(updates[i]['timestamp']) - int(updates[i-1]['timestamp']) for i in range(1, len(updates))]
+    interarrivaltimes = interarrival.interarrival_times(trace, normality='normal')[sensor]
     
     print(plt.subplots())
 
@@ -93,27 +79,29 @@ def plotWriteInterarrivalTimes(sensor='tempin3'):
 
 def getRooms(trace):
     res = {}
-    for request in trace:
-        sourceLoc = request['sourceLocation']
-        address   = request['sourceAddress']
-        if sourceLoc not in res:
-            res[sourceLoc] = set()
-        else:
-            res[sourceLoc].add(address)
+    pairs = np.unique(np.stack([trace['sourceLocation'], trace['sourceAddress']], axis=1), axis=0)
+    locations = trace.labels('sourceLocation')
+    addresses = trace.labels('sourceAddress')
+    for sourceLoc, address in pairs:
+        res.setdefault(locations[sourceLoc], set()).add(addresses[address])
     return res
 
+def agentNumbers(trace, column):
+    # '/agent12/battery5' -> 12, parsed once per distinct label rather than per row
+    agent = np.array([int(label.split('/')[1][5:]) for label in trace.labels(column)])
+    return agent[trace[column]]
+
 def getEdges(trace):
-    res = set()
-    for request in trace:
-        sourceAgent = int(request['sourceAddress'].split('/')[1][5:])
-        destAgent   = int(request['destinationServiceAddress'].split('/')[1][5:])
-        if sourceAgent != destAgent:
-            edge        = (sourceAgent, destAgent) if sourceAgent < destAgent else (destAgent, sourceAgent)
-            res.add(edge)
-    return res
+    sourceAgent = agentNumbers(trace, 'sourceAddress')
+    destAgent   = agentNumbers(trace, 'destinationServiceAddress')
+    remote      = sourceAgent != destAgent
+    low         = np.minimum(sourceAgent[remote], destAgent[remote])
+    high        = np.maximum(sourceAgent[remote], destAgent[remote])
+    edges       = np.unique(np.stack([low, high], axis=1), axis=0)
+    return set((int(n1), int(n2)) for n1, n2 in edges)
 
 def getNormalRequests(trace):
-    return [r for r in trace if r['normality'] == 'normal']
+    return trace.take(trace.mask('normality', 'normal'))
 
 # def main():
 #     setup()
@@ -168,19 +156,11 @@ def write_dict_array_to_csv(path, dict_array):
         dict_writer.writerows(dict_array)
 
 def plot_temp_sensor_updates():
-    trace = read_csv('trace/subTraceWriteTimes.csv')
+    trace = tracestore.open_trace('trace/subTraceWriteTimes.csv')
 
     sensors = [f'tempin{id}' for id in range(1, 4)] # range(1, 7) for all
-    updates = [
-        [
-            request for request in trace if request['sourceID'] == sensor and request['operation'] == 'write'
-        ] for sensor in sensors
-    ]
-    interarrivaltimes = [
-        [
-            (int(row[i]['timestamp']) - int(row[i-1]['timestamp']))/1000 for i in range(1, len(row))
-        ] for row in updates
-    ]
+    updates = interarrival.interarrival_times(trace)
+    interarrivaltimes = [updates[sensor]/1000 for sensor in sensors]
 
     fig, ax = plt.subplots()
     # ax.set_title('Time between updates for temperature sensors in ms')
@@ -192,19 +172,15 @@ def plot_temp_sensor_updates():
     plt.show()
 
 def plot_mov_sensor_updates():
-    trace = read_csv('trace/subTraceWriteTimes.csv')
+    index = traceindex.open_index('trace/subTraceWriteTimes.csv')
 
     sensors = [f'movement{id}' for id in range(1, 4)] # range(1, 7) for all
-    updates = [
-        [
-            request for request in trace if request['sourceID'] == sensor and request['operation'] == 'write' and request['accessedNodeAddress'].endswith('movement')
-        ] for sensor in sensors
-    ]
-    interarrivaltimes = [
-        [
-            (int(row[i]['timestamp']) - int(row[i-1]['timestamp']))/1000/60 for i in range(1, len(row))
-        ] for row in updates
-    ]
+    interarrivaltimes = []
+    for sensor in sensors:
+        history = index.history('sourceID', sensor)
+        movement = np.array([address.endswith('movement') for address in history.labels('accessedNodeAddress')])
+        updates = history.mask('operation', 'write') & movement[history['accessedNodeAddress']]
+        interarrivaltimes.append(np.diff(history['timestamp'][updates])/1000/60)
 
     fig, ax = plt.subplots()
     # ax.set_title('Time between updates for temperature sensors in ms')
@@ -215,6 +191,20 @@ def plot_mov_sensor_updates():
     plt.xlabel('Interarrival Time (min)')
     plt.show()
 
+def plot_all_sensor_updates():
+    # every written node of all 6 agents from a single streaming pass, in bounded memory
+    sketches = sketch.interarrival_sketches('trace/subTraceWriteTimes.csv', by='accessedNodeAddress')
+    nodes = sorted(sketches)
+
+    fig, ax = plt.subplots()
+    stats = [sketches[node].boxplot_stats(node) for node in nodes]
+    for stat in stats:
+        for key in ('med', 'q1', 'q3', 'iqr', 'whislo', 'whishi'):
+            stat[key] = stat[key]/1000/60
+    ax.bxp(stats, showfliers=False, vert=False)
+    plt.xlabel('Interarrival Time (min)')
+    plt.show()
+
 def boxplot(data):
     fig, ax = plt.subplots()
     ax.boxplot(data, showfliers=True)
@@ -260,13 +250,17 @@ def make_bar_plot_latencies():
     plt.ylabel('Latency in ms')
     plt.show()
 
-def make_cumulative():
-    trace     = read_csv('trace/subTrace2.csv')
-    tempin1_updates = [r for r in trace if r['accessedNodeAddress'] == '/agent1/tempin1' and r['operation'] == 'write' and r['normality'] == 'normal']
-    interarrivaltimes = [int(tempin1_updates[i]['timestamp']) - int(tempin1_updates[i-1]['timestamp']) for i in range(1, len(tempin1_updates))]
+def make_cumulative(node='/agent1/tempin1'):
+    # reads only the node's history from the index instead of streaming the whole trace
+    history = traceindex.open_index('trace/subTrace2.csv').history('accessedNodeAddress', node)
+    writes = history.mask('operation', 'write') & history.mask('normality', 'normal')
+    interarrivaltimes = np.diff(history['timestamp'][writes])
+    if len(interarrivaltimes) == 0:
+        print(f'{node}: fewer than 2 writes, no interarrival times')
+        return
     print(len(interarrivaltimes))
 
-    values, base = np.histogram(interarrivaltimes, bins=40)
+    values, base = np.histogram(interarrivaltimes.astype(np.int64), bins=40)
 
     cumulative = np.cumsum(values)
     plt.plot(base[:-1], cumulative, c='blue')
@@ -320,36 +314,8 @@ def main():
 
 
 
-    # # new_trace = []
-    # addresses = set([r['accessedNodeAddress'] for r in trace])
-
-    # lastWrite = {
-    #     address : 0
-    #     for address in addresses
-    # }
-    # nextWrite = {
-    #     address : float('inf')
-    #     for address in addresses
-    # }
-
-    # for request in trace:
-    #     address = request['accessedNodeAddress']
-    #     operation = request['operation']
-    #     timestamp = request['timestamp']
-    #     if operation == 'write':
-    #         lastWrite[address] = timestamp
-    #     request['lastWrite'] = lastWrite[address]
-    #     # new_trace.append(request)
-
-    # for request in reversed(trace):
-    #     address   = request['accessedNodeAddress']
-    #     operation = request['operation']
-    #     timestamp = request['timestamp']
-    #     if operation == 'write':
-    #         nextWrite[address] = timestamp
-    #     request['nextWrite'] = nextWrite[address]
-
-    # write_dict_array_to_csv('trace/subTraceWriteTimes.csv', trace)
+    # subTraceWriteTimes.csv (lastWrite/nextWrite per request) is built by trace/writetimes.py:
+    # python trace/writetimes.py trace/subTrace2.csv trace/subTraceWriteTimes.csv
 
 
 
@@ -368,25 +334,8 @@ def main():
     # write_dict_array_to_csv('trace/subtrace_reads.csv', subtracereads)
 
 
-    # trace = read_csv('trace/fullTrace.csv')
-    # agents = set(['agent1', 'agent2', 'agent3', 'agent4', 'agent5', 'agent6'])
-    # nodes = set(['/agent6/lightcontrol6/lightOn', '/agent2/tempin2', '/agent5/lightcontrol5/lightOn', '/agent3/heatingcontrol1/heatingOn', '/agent6/washingmachine1/washing', '/agent5/battery1/charge', '/agent3/doorlock1/open', '/agent3/movement3/lastChange', '/agent4/battery3/charge', '/agent3/heatingcontrol1', '/agent3/tempin3', '/agent3/lightcontrol3/lightOn', '/agent5/movement5/movement', '/agent5/tempin5', '/agent6/movement6/movement', '/agent6/movement6/lastChange', '/agent1/tempin1', '/agent5/battery2/charge', '/agent5/movement5/lastChange', '/agent3/movement3/movement', '/agent2/movement2/movement', '/agent2/movement2/lastChange', '/agent6/tempin6', '/agent4/movement4/lastChange', '/agent4/movement4/movement', '/agent1/movement1/lastChange', '/agent4/battery3/charging', '/agent5/battery2/charging', '/agent2/lightcontrol2/lightOn', '/agent1/lightcontrol1/lightOn', '/agent4/lightcontrol4/lightOn', '/agent1/movement1/movement', '/agent4/tempin4', '/agent5/battery1/charging'])
-    # version = { node : 0 for node in nodes}
-    # sub_trace = []
-    # for r in trace:
-    #     srcAgent = r['sourceAddress'].split('/')[1]
-    #     dstAgent = r['destinationServiceAddress'].split('/')[1].strip()
-    #     accessedNode = r['accessedNodeAddress']
-
-    #     assert dstAgent == accessedNode.split('/')[1].strip()
-    #     normal = r['normality'] == 'normal'
-    #     operation = r['operation']
-    #     if normal and srcAgent in agents and dstAgent in agents and operation in ['read', 'write']:
-    #         if operation == 'write':
-    #             version[accessedNode] += 1
-    #         r.update({'version': version[accessedNode]})
-    #         sub_trace.append(r)
-    # write_dict_array_to_csv('trace/subTrace2.csv', sub_trace)
+    # subTrace2.csv (agents 1-6, normal reads/writes, per-address version) is built by the streaming pipeline:
+    # python trace/pipeline.py trace/fullTrace.csv trace/subTrace2.csv
 
 
 
@@ -0,0 +1,169 @@
+"""Persistent interning of DS2OS content names.
+
+Content names come in three shapes, one per catalogue:
+
+ * contents.txt:           /agent1/tempin1/v1150
+ * contentsWriteTimes.txt: /agent1/lightcontrol1/lightOn/1520034762330/1520034762330
+ * contentsNoVersions.txt: /agent1/tempin1
+
+Each is split into the accessed node address and a version part ('v1150',
+'1520034762330/1520034762330' or ''). The InternTable hands out a compact
+integer ID per content name and per address, and is saved as one name per
+line (the line number is the ID) so IDs stay stable across the trace tools,
+the catalogue files and the simulator.
+
+Usage from the repository root:
+
+    python trace/interning.py trace/contents.txt trace/contentsWriteTimes.txt trace/contentsNoVersions.txt
+"""
+import argparse
+import os
+from array import array
+
+import numpy as np
+
+from tracestore import NEVER
+
+INTERN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'interned.txt')
+
+
+def _is_write_time(part):
+    return part.isdigit() or part == 'inf'
+
+
+def split_content(name):
+    """Split a content name into (address, version)"""
+    head, _, last = name.rpartition('/')
+    if last[:1] == 'v' and last[1:].isdigit():
+        return head, last
+    if _is_write_time(last):
+        address, _, first = head.rpartition('/')
+        if _is_write_time(first):
+            return address, first + '/' + last
+    return name, ''
+
+
+def content_name(address, version):
+    return f'{address}/{version}' if version else address
+
+
+class InternTable(object):
+    """Bidirectional mapping between content names and integer IDs.
+
+    address_of[i] is the address ID of content i, so version-agnostic
+    policies can group contents without touching strings.
+    """
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        self.addresses = []
+        self.address_ids = {}
+        self.address_of = array('i')
+        self.versions = []
+        for name in names:
+            self.intern(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """Return the ID of a content name, adding it if needed"""
+        i = self.ids.get(name)
+        if i is None:
+            address, version = split_content(name)
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.versions.append(version)
+            self.address_of.append(self.intern_address(address))
+        return i
+
+    def intern_address(self, address):
+        i = self.address_ids.get(address)
+        if i is None:
+            i = self.address_ids[address] = len(self.addresses)
+            self.addresses.append(address)
+        return i
+
+    def name(self, i):
+        return self.names[i]
+
+    def address(self, i):
+        return self.addresses[self.address_of[i]]
+
+    def version(self, i):
+        return self.versions[i]
+
+    def intern_file(self, path):
+        """Intern every line of a catalogue file, returning the IDs in file order"""
+        with open(path) as f:
+            return [self.intern(line.strip()) for line in f if line.strip()]
+
+    def save(self, path=INTERN_FILE):
+        # write aside and rename so concurrent readers never see a partial table
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write('\n'.join(self.names))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=INTERN_FILE):
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            return cls(line.rstrip('\n') for line in f)
+
+
+_table = None
+
+
+def load_table(path=INTERN_FILE):
+    """Return the process-wide table, loading it on first use"""
+    global _table
+    if _table is None:
+        _table = InternTable.load(path)
+    return _table
+
+
+def content_ids(trace, table, kind='version'):
+    """Return the content ID requested by every row of a columnar Trace.
+
+    kind selects the catalogue the names follow: 'version' (address/vN, needs
+    the version column of subTrace2.csv), 'writetimes' (address/lastWrite/
+    nextWrite, needs subTraceWriteTimes.csv) or 'address'. Only the distinct
+    (address, version) pairs are formatted and interned.
+    """
+    address = trace['accessedNodeAddress'].astype(np.int64)
+    labels = trace.labels('accessedNodeAddress')
+    if kind == 'address':
+        lookup = np.array([table.intern(a) for a in labels], dtype=np.int64)
+        return lookup[address]
+    if kind == 'version':
+        parts = [trace['version']]
+        fmt = lambda a, v: f'{a}/v{v[0]}'
+    elif kind == 'writetimes':
+        parts = [trace['lastWrite'], trace['nextWrite']]
+        fmt = lambda a, v: f"{a}/{v[0]}/{'inf' if v[1] == NEVER else v[1]}"
+    else:
+        raise ValueError(f'unknown content kind {kind}')
+    keys = np.stack([address] + [np.asarray(p) for p in parts], axis=1)
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    lookup = np.array([table.intern(fmt(labels[k[0]], k[1:].tolist())) for k in unique], dtype=np.int64)
+    return lookup[inverse.ravel()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Intern the content names of DS2OS catalogue files')
+    parser.add_argument('contents', nargs='+', help='catalogue files, e.g. trace/contents.txt')
+    parser.add_argument('-o', '--output', default=INTERN_FILE, help='the intern table to extend')
+    args = parser.parse_args()
+    table = InternTable.load(args.output)
+    for path in args.contents:
+        ids = table.intern_file(path)
+        print(path, len(ids), 'contents')
+    table.save(args.output)
+    print('interned', len(table), 'contents and', len(table.addresses), 'addresses')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Streaming extraction of the DS2OS subtrace.
+
+Builds subTrace2.csv from fullTrace.csv with a chain of generators
+
+    read -> filter (normality, agents, operation) -> version annotation -> write
+
+so only one row is alive at a time and memory stays flat whatever the trace
+size. Every stage takes and returns a (header, rows) pair where rows are
+plain lists, which keeps the per-row work to a few index lookups.
+
+Usage from the repository root:
+
+    python trace/pipeline.py trace/fullTrace.csv trace/subTrace2.csv
+"""
+import argparse
+import csv
+
+# agents whose requests make up the subtrace
+AGENTS = frozenset(f'agent{i}' for i in range(1, 7))
+
+OPERATIONS = frozenset(['read', 'write'])
+
+# read/write buffer size, large enough that the csv module rather than the
+# system calls dominates
+BUFFER_SIZE = 1 << 20
+
+
+def agent_of(address, _cache={}):
+    """'/agent3/tempin3' -> 'agent3', memoized since addresses repeat millions of times"""
+    agent = _cache.get(address)
+    if agent is None:
+        agent = _cache[address] = address.split('/')[1].strip()
+    return agent
+
+
+def read_trace(path):
+    """Open a trace CSV and return its header and a generator over its rows"""
+    f = open(path, newline='', buffering=BUFFER_SIZE)
+    reader = csv.reader(f)
+    header = next(reader)
+
+    def rows():
+        with f:
+            yield from reader
+    return header, rows()
+
+
+def filter_requests(header, rows, agents=AGENTS, operations=OPERATIONS, normality='normal'):
+    """Keep the requests of a given normality between the given agents"""
+    src = header.index('sourceAddress')
+    dst = header.index('destinationServiceAddress')
+    node = header.index('accessedNodeAddress')
+    op = header.index('operation')
+    norm = header.index('normality')
+
+    def stage():
+        for row in rows:
+            if row[norm] != normality or row[op] not in operations:
+                continue
+            dstAgent = agent_of(row[dst])
+            assert dstAgent == agent_of(row[node])
+            if dstAgent in agents and agent_of(row[src]) in agents:
+                yield row
+    return header, stage()
+
+
+def annotate_versions(header, rows):
+    """Append a version column counting the writes to each accessedNodeAddress.
+
+    A write creates the version it carries, reads carry the latest version
+    written before them (0 if the address was never written).
+    """
+    node = header.index('accessedNodeAddress')
+    op = header.index('operation')
+
+    def stage():
+        version = {}
+        for row in rows:
+            address = row[node]
+            if row[op] == 'write':
+                version[address] = version.get(address, 0) + 1
+            row.append(version.get(address, 0))
+            yield row
+    return header + ['version'], stage()
+
+
+def write_trace(path, header, rows):
+    """Write rows to a CSV file and return how many were written"""
+    n = 0
+    with open(path, 'w', newline='', buffering=BUFFER_SIZE) as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            n += 1
+    return n
+
+
+def extract_subtrace(src_path, dst_path, agents=AGENTS):
+    header, rows = read_trace(src_path)
+    header, rows = filter_requests(header, rows, agents)
+    header, rows = annotate_versions(header, rows)
+    return write_trace(dst_path, header, rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract the versioned DS2OS subtrace')
+    parser.add_argument('src', help='the full trace, e.g. trace/fullTrace.csv')
+    parser.add_argument('dst', help='the subtrace to write, e.g. trace/subTrace2.csv')
+    args = parser.parse_args()
+    n = extract_subtrace(args.src, args.dst)
+    print('wrote', n, 'requests to', args.dst)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Streaming quantile sketches for interarrival-time CDFs and boxplots.
+
+KLLSketch is the compactor-hierarchy sketch of Karnin, Lang and Liberty:
+items enter the lowest compactor, and a full compactor sorts itself and
+promotes every other item (random offset) one level up, where each item
+stands for twice as many observations. Compactor capacities shrink
+geometrically towards the bottom, so memory stays O(k log(n / k)) while
+ranks are off by roughly n / k at most.
+
+interarrival_sketches() streams a trace CSV and feeds one sketch per sensor,
+which is enough to draw CDFs (rank) and boxplots (boxplot_stats, for
+matplotlib's Axes.bxp) of the full trace without holding its timestamps.
+"""
+import math
+import random
+
+import pipeline
+
+
+class KLLSketch(object):
+
+    def __init__(self, k=200, c=2/3, seed=None):
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._random = random.Random(seed)
+        self._compactors = []
+        self._size = 0
+        self._grow()
+
+    def _capacity(self, level):
+        depth = len(self._compactors) - level - 1
+        return int(math.ceil(self.k * self.c ** depth)) + 1
+
+    def _grow(self):
+        self._compactors.append([])
+        self._max_size = sum(self._capacity(h) for h in range(len(self._compactors)))
+
+    def update(self, x):
+        self._compactors[0].append(x)
+        self._size += 1
+        self.n += 1
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        if self._size >= self._max_size:
+            self._compress()
+
+    def _compress(self):
+        for level, items in enumerate(self._compactors):
+            if len(items) >= self._capacity(level):
+                if level + 1 == len(self._compactors):
+                    self._grow()
+                items.sort()
+                # an odd item out stays behind so no weight is lost
+                keep = [items.pop()] if len(items) % 2 else []
+                self._compactors[level + 1].extend(items[self._random.randint(0, 1)::2])
+                items[:] = keep
+                self._size = sum(len(c) for c in self._compactors)
+                if self._size < self._max_size:
+                    break
+
+    def merge(self, other):
+        """Fold another sketch into this one"""
+        while len(self._compactors) < len(other._compactors):
+            self._grow()
+        for level, items in enumerate(other._compactors):
+            self._compactors[level].extend(items)
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._size = sum(len(c) for c in self._compactors)
+        while self._size >= self._max_size:
+            self._compress()
+
+    def _weighted(self):
+        return sorted((x, 2 ** level) for level, c in enumerate(self._compactors) for x in c)
+
+    def rank(self, x):
+        """Estimated number of observations <= x"""
+        return sum(len([y for y in c if y <= x]) * 2 ** level for level, c in enumerate(self._compactors))
+
+    def cdf(self, points):
+        """Estimated fraction of observations <= each of the (sorted) points"""
+        items = self._weighted()
+        total = sum(w for _, w in items)
+        res = []
+        i = acc = 0
+        for p in points:
+            while i < len(items) and items[i][0] <= p:
+                acc += items[i][1]
+                i += 1
+            res.append(acc / total if total else 0.0)
+        return res
+
+    def quantiles(self, qs):
+        """Estimated values at each of the (sorted) fractions in qs"""
+        items = self._weighted()
+        total = sum(w for _, w in items)
+        res = []
+        i = acc = 0
+        for q in qs:
+            if q <= 0:
+                res.append(self.min)
+                continue
+            if q >= 1:
+                res.append(self.max)
+                continue
+            while i < len(items) and acc + items[i][1] < q * total:
+                acc += items[i][1]
+                i += 1
+            res.append(items[min(i, len(items) - 1)][0])
+        return res
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+    def boxplot_stats(self, label=None, whis=1.5):
+        """Boxplot statistics in the format of matplotlib.cbook.boxplot_stats,
+        ready for Axes.bxp. Fliers are not kept by the sketch.
+        """
+        q1, med, q3 = self.quantiles([0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        low, high = q1 - whis * iqr, q3 + whis * iqr
+        retained = [x for c in self._compactors for x in c]
+        return {
+            'label': label,
+            'med': med,
+            'q1': q1,
+            'q3': q3,
+            'iqr': iqr,
+            'whislo': min([x for x in retained if x >= low] or [q1]),
+            'whishi': max([x for x in retained if x <= high] or [q3]),
+            'fliers': [],
+            'mean': None,
+        }
+
+    def __len__(self):
+        return self.n
+
+
+def interarrival_sketches(path, by='sourceID', operation='write', suffix=None, normality=None, k=200):
+    """Stream a trace CSV and return a dict mapping every `by` label to a
+    KLLSketch of its interarrival times in ms. The filters match those of
+    interarrival.interarrival_times().
+    """
+    header, rows = pipeline.read_trace(path)
+    key = header.index(by)
+    op = header.index('operation')
+    norm = header.index('normality')
+    node = header.index('accessedNodeAddress')
+    ts = header.index('timestamp')
+    last = {}
+    sketches = {}
+    for row in rows:
+        if operation is not None and row[op] != operation:
+            continue
+        if normality is not None and row[norm] != normality:
+            continue
+        if suffix is not None and not row[node].endswith(suffix):
+            continue
+        label = row[key]
+        t = int(row[ts])
+        prev = last.get(label)
+        last[label] = t
+        if prev is not None:
+            sketch = sketches.get(label)
+            if sketch is None:
+                sketch = sketches[label] = KLLSketch(k)
+            sketch.update(t - prev)
+    return sketches
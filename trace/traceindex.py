@@ -0,0 +1,104 @@
+"""Per-object row index into a columnar trace store.
+
+For each indexed column (accessedNodeAddress and sourceID by default) the
+index keeps, per label code, the sorted row numbers holding that code in CSR
+form: rows[offsets[c]:offsets[c + 1]] are the rows of code c. Both arrays are
+saved inside the store directory and memory-mapped together with the trace
+columns, so pulling one sensor's history reads only that history's pages
+instead of scanning the whole trace.
+
+Usage from the repository root:
+
+    python trace/traceindex.py trace/subTrace2.csv
+"""
+import argparse
+import os
+
+import numpy as np
+
+import tracestore
+
+INDEXED_COLUMNS = ['accessedNodeAddress', 'sourceID']
+
+INDEX_DIR = 'index'
+
+
+def _paths(path, column):
+    base = os.path.join(path, INDEX_DIR, column)
+    return base + '.rows.npy', base + '.offsets.npy'
+
+
+def build_index(path, trace=None, columns=INDEXED_COLUMNS):
+    """Write the row index of a store for the given columns"""
+    if trace is None:
+        trace = tracestore.load(path)
+    if not os.path.exists(os.path.join(path, INDEX_DIR)):
+        os.makedirs(os.path.join(path, INDEX_DIR))
+    for column in columns:
+        codes = trace[column]
+        rows = np.argsort(codes, kind='stable')
+        offsets = np.zeros(len(trace.labels(column)) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(offsets) - 1), out=offsets[1:])
+        rows_path, offsets_path = _paths(path, column)
+        np.save(rows_path, rows.astype(np.int64))
+        np.save(offsets_path, offsets)
+
+
+def _is_stale(path, columns):
+    meta = os.path.join(path, tracestore.META_FILE)
+    for column in columns:
+        for p in _paths(path, column):
+            if not os.path.exists(p) or os.path.getmtime(p) < os.path.getmtime(meta):
+                return True
+    return False
+
+
+class TraceIndex(object):
+    """A memory-mapped trace store together with its row index"""
+
+    def __init__(self, path, columns=INDEXED_COLUMNS):
+        self.trace = tracestore.load(path)
+        if _is_stale(path, columns):
+            build_index(path, self.trace, columns)
+        self._index = {}
+        for column in columns:
+            rows_path, offsets_path = _paths(path, column)
+            self._index[column] = (np.load(rows_path, mmap_mode='r'),
+                                   np.load(offsets_path, mmap_mode='r'))
+
+    def rows(self, column, label):
+        """Return the row numbers, in trace order, where column equals label"""
+        code = self.trace.code(column, label)
+        rows, offsets = self._index[column]
+        if code < 0:
+            return np.empty(0, dtype=np.int64)
+        return np.asarray(rows[offsets[code]:offsets[code + 1]])
+
+    def history(self, column, label):
+        """Return the requests where column equals label as an in-memory Trace"""
+        return self.trace.take(self.rows(column, label))
+
+
+def open_index(csv_path, columns=INDEXED_COLUMNS):
+    """Open the indexed store of a trace CSV, converting and indexing it first
+    if needed
+    """
+    path = tracestore.store_path(csv_path)
+    if tracestore.is_stale(csv_path, path):
+        tracestore.convert(csv_path, path)
+    return TraceIndex(path, columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the per-object row index of a trace')
+    parser.add_argument('csv', help='the trace CSV file')
+    args = parser.parse_args()
+    path = tracestore.store_path(args.csv)
+    if tracestore.is_stale(args.csv, path):
+        tracestore.convert(args.csv, path)
+    build_index(path)
+    print('indexed', path)
+
+
+if __name__ == '__main__':
+    main()
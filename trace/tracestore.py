@@ -0,0 +1,323 @@
+"""Columnar on-disk store for DS2OS trace files.
+
+The CSV traces (fullTrace.csv, subTrace2.csv, subTraceWriteTimes.csv) are
+parsed once by convert() into a directory of .npy files, one per column:
+
+ * timestamps and the derived version/lastWrite/nextWrite columns are int64
+ * string columns (sourceID, sourceAddress, accessedNodeAddress, operation,
+   normality, ...) are dictionary encoded: an int32 code per row plus the list
+   of distinct labels stored in meta.json
+ * the free-form value column is kept raw as one byte buffer plus row offsets
+
+load() memory-maps the columns back, so opening even the full trace takes
+milliseconds and only the columns an analysis touches are ever paged in.
+
+Usage from the repository root:
+
+    python trace/tracestore.py trace/fullTrace.csv
+"""
+import argparse
+import csv
+import io
+import json
+import os
+from array import array
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+
+# Columns parsed as integers, everything else except RAW_COLUMNS is encoded
+INT_COLUMNS = {'timestamp', 'version', 'lastWrite', 'nextWrite'}
+RAW_COLUMNS = {'value'}
+
+# nextWrite is float('inf') in subTraceWriteTimes.csv when there is no later
+# write, int64 columns store this sentinel instead
+NEVER = np.iinfo(np.int64).max
+
+META_FILE = 'meta.json'
+
+# below this size a single process parses faster than a pool starts up
+PARALLEL_MIN_SIZE = 64 * 2 ** 20
+
+
+def store_path(csv_path):
+    """Return the default store directory for a trace CSV, e.g.
+    trace/fullTrace.csv -> trace/fullTrace.cols
+    """
+    return os.path.splitext(csv_path)[0] + '.cols'
+
+
+def _parse_int(field):
+    return NEVER if field == 'inf' else int(field)
+
+
+class Trace(object):
+    """A trace held as typed columns.
+
+    Integer columns are returned as int64 arrays and categorical columns as
+    int32 code arrays, use code()/labels()/decode() to translate between codes
+    and strings.
+    """
+
+    def __init__(self, n_rows, columns, categories, data, value_data=None, value_offsets=None):
+        self.n_rows = n_rows
+        self.columns = columns
+        self.categories = categories
+        self._data = data
+        self._value_data = value_data
+        self._value_offsets = value_offsets
+        self._codes = {col: {label: i for i, label in enumerate(labels)}
+                       for col, labels in categories.items()}
+
+    def __len__(self):
+        return self.n_rows
+
+    def __getitem__(self, column):
+        return self._data[column]
+
+    def __contains__(self, column):
+        return column in self._data or (column in RAW_COLUMNS and self._value_data is not None)
+
+    def labels(self, column):
+        return self.categories[column]
+
+    def code(self, column, label):
+        """Return the code of label in a categorical column, -1 if absent"""
+        return self._codes[column].get(label, -1)
+
+    def mask(self, column, label):
+        """Boolean mask of the rows where a categorical column equals label"""
+        return self._data[column] == self.code(column, label)
+
+    def decode(self, column, rows=None):
+        codes = self._data[column] if rows is None else self._data[column][rows]
+        labels = self.categories[column]
+        return [labels[c] for c in codes]
+
+    def value(self, i):
+        start, end = self._value_offsets[i], self._value_offsets[i + 1]
+        return bytes(self._value_data[start:end]).decode()
+
+    def row(self, i):
+        """Return row i as the dict csv.DictReader would have produced"""
+        res = {}
+        for col in self.columns:
+            if col in RAW_COLUMNS:
+                res[col] = self.value(i)
+            elif col in self.categories:
+                res[col] = self.categories[col][self._data[col][i]]
+            else:
+                v = int(self._data[col][i])
+                res[col] = 'inf' if v == NEVER else str(v)
+        return res
+
+    def take(self, rows):
+        """Return a new in-memory Trace holding only the selected rows.
+
+        rows can be a boolean mask or an array of row indices.
+        """
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        data = {col: np.asarray(arr[rows]) for col, arr in self._data.items()}
+        value_data = value_offsets = None
+        if self._value_offsets is not None:
+            starts = self._value_offsets[rows]
+            lengths = self._value_offsets[rows + 1] - starts
+            value_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=value_offsets[1:])
+            gather = np.repeat(starts - value_offsets[:-1], lengths) + np.arange(value_offsets[-1])
+            value_data = np.asarray(self._value_data[gather])
+        return Trace(len(rows), self.columns, self.categories, data, value_data, value_offsets)
+
+
+def _parse_rows(reader, columns):
+    """Parse CSV rows into one columnar chunk.
+
+    Every column lives in a compact typed buffer, so memory stays at a few
+    bytes per field rather than one dict per row.
+    """
+    ints = {col: array('q') for col in columns if col in INT_COLUMNS}
+    cats = {col: array('i') for col in columns
+            if col not in INT_COLUMNS and col not in RAW_COLUMNS}
+    codes = {col: {} for col in cats}
+    value_data = bytearray()
+    value_offsets = array('q', [0])
+    # bind each column index to its sink once instead of per field
+    sinks = []
+    for i, col in enumerate(columns):
+        if col in ints:
+            sinks.append((i, 0, ints[col], None))
+        elif col in cats:
+            sinks.append((i, 1, cats[col], codes[col]))
+        else:
+            sinks.append((i, 2, None, None))
+    n_rows = 0
+    for row in reader:
+        for i, kind, buf, table in sinks:
+            field = row[i]
+            if kind == 0:
+                buf.append(_parse_int(field))
+            elif kind == 1:
+                code = table.get(field)
+                if code is None:
+                    code = table[field] = len(table)
+                buf.append(code)
+            else:
+                value_data += field.encode()
+                value_offsets.append(len(value_data))
+        n_rows += 1
+    return {
+        'n_rows': n_rows,
+        'ints': {col: np.frombuffer(buf, dtype=np.int64) for col, buf in ints.items()},
+        'cats': {col: np.frombuffer(buf, dtype=np.int32) for col, buf in cats.items()},
+        'categories': {col: list(table) for col, table in codes.items()},
+        'value_data': np.frombuffer(bytes(value_data), dtype=np.uint8),
+        'value_offsets': np.frombuffer(value_offsets, dtype=np.int64),
+    }
+
+
+def _parse_range(task):
+    """Parse the rows in the byte range [start, end) of a trace CSV"""
+    csv_path, columns, start, end = task
+    with open(csv_path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode()
+    return _parse_rows(csv.reader(io.StringIO(text, newline='')), columns)
+
+
+def _split_ranges(csv_path, n):
+    """Split the body of a CSV into up to n newline-aligned byte ranges"""
+    size = os.path.getsize(csv_path)
+    with open(csv_path, 'rb') as f:
+        f.readline()
+        bounds = [f.tell()]
+        body = size - bounds[0]
+        for k in range(1, n):
+            f.seek(bounds[0] + k * body // n)
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    bounds.append(size)
+    bounds = sorted(set(bounds))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _merge(chunks, columns):
+    """Concatenate chunks in order, recoding their categories into one table.
+
+    Labels keep their first-seen order, so the result is identical to a
+    serial parse of the whole file.
+    """
+    categories = {col: {} for col in chunks[0]['cats']}
+    cats = {col: [] for col in categories}
+    for chunk in chunks:
+        for col, table in categories.items():
+            remap = np.array([table.setdefault(label, len(table)) for label in chunk['categories'][col]],
+                             dtype=np.int32)
+            cats[col].append(remap[chunk['cats'][col]] if len(remap) else chunk['cats'][col])
+    base = 0
+    value_offsets = [np.zeros(1, dtype=np.int64)]
+    for chunk in chunks:
+        value_offsets.append(chunk['value_offsets'][1:] + base)
+        base += len(chunk['value_data'])
+    return {
+        'n_rows': sum(chunk['n_rows'] for chunk in chunks),
+        'ints': {col: np.concatenate([chunk['ints'][col] for chunk in chunks]) for col in chunks[0]['ints']},
+        'cats': {col: np.concatenate(arrs) for col, arrs in cats.items()},
+        'categories': {col: list(table) for col, table in categories.items()},
+        'value_data': np.concatenate([chunk['value_data'] for chunk in chunks]),
+        'value_offsets': np.concatenate(value_offsets),
+    }
+
+
+def _save(path, csv_path, columns, chunk):
+    if not os.path.exists(path):
+        os.makedirs(path)
+    for col, arr in chunk['ints'].items():
+        np.save(os.path.join(path, col + '.npy'), arr)
+    for col, arr in chunk['cats'].items():
+        np.save(os.path.join(path, col + '.npy'), arr)
+    if any(col in RAW_COLUMNS for col in columns):
+        np.save(os.path.join(path, 'value.data.npy'), chunk['value_data'])
+        np.save(os.path.join(path, 'value.offsets.npy'), chunk['value_offsets'])
+    meta = {
+        'source': os.path.abspath(csv_path),
+        'n_rows': chunk['n_rows'],
+        'columns': columns,
+        'categories': chunk['categories'],
+    }
+    # meta.json is written last and marks the store as complete
+    with open(os.path.join(path, META_FILE), 'w') as f:
+        json.dump(meta, f)
+
+
+def convert(csv_path, path=None, processes=None):
+    """Parse a trace CSV and write it as a columnar store.
+
+    Files larger than PARALLEL_MIN_SIZE are split into newline-aligned byte
+    ranges parsed by a pool of processes (one per core unless processes is
+    given) and concatenated in order. The trace has no quoted newlines, which
+    is what makes splitting at arbitrary line ends safe. Returns the store
+    directory.
+    """
+    path = path or store_path(csv_path)
+    processes = processes or cpu_count()
+    with open(csv_path, newline='') as f:
+        reader = csv.reader(f)
+        columns = next(reader)
+        if processes == 1 or os.path.getsize(csv_path) < PARALLEL_MIN_SIZE:
+            chunk = _parse_rows(reader, columns)
+    if processes > 1 and os.path.getsize(csv_path) >= PARALLEL_MIN_SIZE:
+        # a few ranges per process evens out rows of different lengths
+        tasks = [(csv_path, columns, start, end)
+                 for start, end in _split_ranges(csv_path, 4 * processes)]
+        with Pool(processes) as pool:
+            chunk = _merge(pool.map(_parse_range, tasks), columns)
+    _save(path, csv_path, columns, chunk)
+    return path
+
+
+def load(path, mmap=True):
+    """Open a columnar store written by convert()"""
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    mmap_mode = 'r' if mmap else None
+    data = {}
+    value_data = value_offsets = None
+    for col in meta['columns']:
+        if col in RAW_COLUMNS:
+            value_data = np.load(os.path.join(path, 'value.data.npy'), mmap_mode=mmap_mode)
+            value_offsets = np.load(os.path.join(path, 'value.offsets.npy'), mmap_mode=mmap_mode)
+        else:
+            data[col] = np.load(os.path.join(path, col + '.npy'), mmap_mode=mmap_mode)
+    return Trace(meta['n_rows'], meta['columns'], meta['categories'], data, value_data, value_offsets)
+
+
+def is_stale(csv_path, path=None):
+    path = path or store_path(csv_path)
+    meta = os.path.join(path, META_FILE)
+    return not os.path.exists(meta) or os.path.getmtime(meta) < os.path.getmtime(csv_path)
+
+
+def open_trace(csv_path, path=None):
+    """Load the store for csv_path, converting the CSV first if the store is
+    missing or older than the CSV
+    """
+    path = path or store_path(csv_path)
+    if is_stale(csv_path, path):
+        convert(csv_path, path)
+    return load(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a trace CSV into a columnar store')
+    parser.add_argument('csv', help='the trace CSV file')
+    parser.add_argument('-o', '--output', help='the store directory (default: next to the CSV)')
+    parser.add_argument('-p', '--processes', type=int, help='number of parser processes (default: one per core)')
+    args = parser.parse_args()
+    path = convert(args.csv, args.output, args.processes)
+    print('wrote', path)
+
+
+if __name__ == '__main__':
+    main()
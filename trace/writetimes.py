@@ -0,0 +1,135 @@
+"""Vectorized lastWrite/nextWrite annotation of a DS2OS trace.
+
+Every request gets the timestamp of the latest write to its
+accessedNodeAddress at or before it (lastWrite, 0 if there is none) and of
+the earliest write at or after it (nextWrite, inf if there is none). A write
+carries its own timestamp in both columns. Together with the address these
+two values name the version a read sees, which is how contentsWriteTimes.txt
+keys its objects.
+
+Rows are grouped by address with one stable sort and each row finds its
+neighbouring writes with np.searchsorted, so the whole trace is annotated in
+a handful of array passes instead of two Python loops over dicts.
+
+Usage from the repository root:
+
+    python trace/writetimes.py trace/subTrace2.csv trace/subTraceWriteTimes.csv
+"""
+import argparse
+import csv
+
+import numpy as np
+
+import tracestore
+from tracestore import NEVER
+
+
+def next_use(keys):
+    """Return for every position the index of the next position holding the
+    same key, or len(keys) if the key does not occur again.
+    """
+    keys = np.asarray(keys)
+    n = len(keys)
+    res = np.full(n, n, dtype=np.int64)
+    if n == 0:
+        return res
+    order = np.argsort(keys, kind='stable')
+    same = keys[order[1:]] == keys[order[:-1]]
+    res[order[:-1][same]] = order[1:][same]
+    return res
+
+
+def annotate_write_times(trace):
+    """Compute lastWrite, nextWrite and next-request distances for a Trace.
+
+    Returns a dict of int64 arrays indexed by row:
+
+     * lastWrite: timestamp of the latest write to the row's address at or
+       before the row, 0 if there is none
+     * nextWrite: timestamp of the earliest write at or after the row,
+       tracestore.NEVER if there is none
+     * version: a key unique per (address, lastWrite), i.e. per content
+       object a read can hit in a cache
+     * nextRequest: for reads, the number of reads until the next read of the
+       same version, NEVER if it is not read again; NEVER for writes
+
+    nextRequest is exactly the distance Belady's MIN evicts by.
+    """
+    n = len(trace)
+    address = trace['accessedNodeAddress']
+    timestamp = trace['timestamp']
+    is_write = trace.mask('operation', 'write')
+    is_read = trace.mask('operation', 'read')
+
+    # stable sort keeps trace order inside every address group
+    order = np.argsort(address, kind='stable')
+    sorted_address = address[order]
+    boundary = np.ones(n, dtype=bool)
+    boundary[1:] = sorted_address[1:] != sorted_address[:-1]
+    starts = np.flatnonzero(boundary)
+    group = np.cumsum(boundary) - 1
+    group_start = starts[group]
+    group_end = np.append(starts[1:], n)[group]
+
+    # positions (in sorted order) of all writes, searched from every row
+    writes = np.flatnonzero(is_write[order])
+    pos = np.arange(n)
+    write_ts = timestamp[order][writes]
+
+    prev = np.searchsorted(writes, pos, side='right') - 1
+    has_prev = prev >= 0
+    has_prev[has_prev] = writes[prev[has_prev]] >= group_start[has_prev]
+    nxt = np.searchsorted(writes, pos, side='left')
+    has_next = nxt < len(writes)
+    has_next[has_next] = writes[nxt[has_next]] < group_end[has_next]
+
+    last_write = np.zeros(n, dtype=np.int64)
+    next_write = np.full(n, NEVER, dtype=np.int64)
+    last_write[order[has_prev]] = write_ts[prev[has_prev]]
+    next_write[order[has_next]] = write_ts[nxt[has_next]]
+
+    # the index of the preceding write is unique per version, reads before the
+    # first write of an address get a negative key of their own
+    version = np.empty(n, dtype=np.int64)
+    version[order] = np.where(has_prev, prev, -(group + 1))
+
+    next_request = np.full(n, NEVER, dtype=np.int64)
+    reads = np.flatnonzero(is_read)
+    read_next = next_use(version[reads])
+    again = read_next < len(reads)
+    next_request[reads[again]] = read_next[again] - np.flatnonzero(again)
+
+    return {
+        'lastWrite': last_write,
+        'nextWrite': next_write,
+        'version': version,
+        'nextRequest': next_request,
+    }
+
+
+def write_annotated(src_path, dst_path, annotation):
+    """Copy a trace CSV adding the lastWrite and nextWrite columns"""
+    last_write = annotation['lastWrite'].tolist()
+    next_write = ['inf' if t == NEVER else t for t in annotation['nextWrite'].tolist()]
+    with open(src_path, newline='') as src, open(dst_path, 'w', newline='') as dst:
+        reader = csv.reader(src)
+        writer = csv.writer(dst)
+        writer.writerow(next(reader) + ['lastWrite', 'nextWrite'])
+        for row, lw, nw in zip(reader, last_write, next_write):
+            row.append(lw)
+            row.append(nw)
+            writer.writerow(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Annotate a trace with lastWrite/nextWrite timestamps')
+    parser.add_argument('src', help='the versioned trace, e.g. trace/subTrace2.csv')
+    parser.add_argument('dst', help='the output, e.g. trace/subTraceWriteTimes.csv')
+    args = parser.parse_args()
+    trace = tracestore.open_trace(args.src)
+    write_annotated(args.src, args.dst, annotate_write_times(trace))
+    print('wrote', args.dst)
+
+
+if __name__ == '__main__':
+    main()